@@ -1,41 +1,244 @@
 # app.py
+import atexit
 import base64
+import gzip
+import json
+import mimetypes
+import os
+import queue
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import types
+import uuid
+import zlib
+from collections import Counter, OrderedDict, namedtuple
+from contextlib import contextmanager
+from functools import wraps
+from html import escape as html_escape
+import numpy as np
 import pandas as pd
 import io
-from dash import Dash, html, dcc, callback, Output, Input
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dash import Dash, html, dcc, callback, ctx, Output, Input, State, MATCH, ALL, Patch
+from dash.development.base_component import Component
+from dash.exceptions import PreventUpdate
+from flask import g, request, send_from_directory
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
 from datetime import datetime
 import logging
+import logging.handlers
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Snapshots colunares são opcionais
+    pa = None
+    feather = None
+
+try:
+    import brotli
+except ImportError:  # Sem brotli, as respostas são comprimidas só com gzip
+    brotli = None
 
 # Configurar o logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),  # Salva logs em um arquivo
-        logging.StreamHandler()  # Exibe logs no console
-    ]
-)
+# As mensagens são enfileiradas (QueueHandler) e gravadas no arquivo e no
+# console por uma thread própria (QueueListener): a requisição não espera o
+# disco. Dumps de DataFrames só são montados com LOG_LEVEL=DEBUG. Mensagens
+# abaixo de WARNING emitidas numa requisição são amostradas por requisição,
+# com a taxa da rota (LOG_SAMPLE_ROUTES, ex.: '/metrics=0,/despesas=0.1') ou
+# LOG_SAMPLE_RATE; com LOG_FORMAT=json cada mensagem é uma linha JSON.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_FILE = os.environ.get('LOG_FILE', 'app.log')
+LOG_CONSOLE = os.environ.get('LOG_CONSOLE', '1') == '1'
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1'))
+LOG_SAMPLE_ROUTES = {route.strip(): float(rate) for route, rate in (
+    item.rsplit('=', 1) for item in os.environ.get('LOG_SAMPLE_ROUTES', '').split(',') if item.strip())}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {'time': self.formatTime(record), 'level': record.levelname, 'logger': record.name,
+                 'pid': record.process, 'thread': record.threadName, 'message': record.getMessage()}
+        if getattr(record, 'route', None):
+            entry['route'] = record.route
+        return json.dumps(entry, ensure_ascii=False)
+
+# Descarta as mensagens informativas das requisições não amostradas e anota a rota
+def _sample_log_record(record):
+    record.route = getattr(_request_state, 'route', None)
+    return record.levelno >= logging.WARNING or getattr(_request_state, 'log_sampled', True)
+
+_log_queue = queue.SimpleQueue()
+_log_handlers = []
+if LOG_FILE:
+    _log_handlers.append(logging.FileHandler(LOG_FILE))  # Salva logs em um arquivo
+if LOG_CONSOLE:
+    _log_handlers.append(logging.StreamHandler())  # Exibe logs no console
+for _handler in _log_handlers:
+    _handler.setFormatter(JsonFormatter() if LOG_FORMAT == 'json'
+                          else logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # O formato final é aplicado na thread de escrita
+_queue_handler.addFilter(_sample_log_record)
+_log_listener = None
+
+# Inicia a thread que grava os logs enfileirados
+def start_log_listener():
+    global _log_listener
+    _log_listener = logging.handlers.QueueListener(_log_queue, *_log_handlers, respect_handler_level=True)
+    _log_listener.start()
+
+# Grava as mensagens ainda na fila e encerra a thread de escrita
+def stop_log_listener():
+    _log_listener.stop()
+
+if multiprocessing.parent_process() is None:
+    logging.basicConfig(level=LOG_LEVEL, handlers=[_queue_handler])
+    start_log_listener()
+    # Threads não sobrevivem ao fork (workers do Gunicorn): a fila é esvaziada
+    # antes e a thread de escrita é refeita nos dois processos
+    os.register_at_fork(before=stop_log_listener, after_in_parent=start_log_listener,
+                        after_in_child=start_log_listener)
+    atexit.register(stop_log_listener)
+else:
+    # Processos do pool de ingestão gravam direto: terminam sem esvaziar uma fila
+    logging.basicConfig(level=LOG_LEVEL, handlers=_log_handlers)
 logger = logging.getLogger(__name__)
 
+# --- Instrumentação: Tempo por Etapa ---
+# Cada requisição acumula o tempo gasto em cada etapa: 'carga' (leitura dos
+# dados), 'agregacao' (filtros e métricas derivadas), 'figuras' (montagem das
+# figuras Plotly), 'layout' (árvore de componentes) e 'serializacao' (o
+# restante da chamada do Dash: JSON da resposta e compressão). As etapas são
+# exclusivas: o tempo de uma etapa aninhada não é contado na etapa externa.
+# Fora de uma requisição (aquecimento, recarga a quente) nada é registrado.
+
+_request_state = threading.local()
+
+@contextmanager
+def stage(name):
+    stages = getattr(_request_state, 'stages', None)
+    if stages is None:
+        yield
+        return
+    stack = _request_state.stack
+    stack.append(0.0)  # Tempo das etapas internas
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stages[name] = stages.get(name, 0.0) + elapsed - stack.pop()
+        if stack:
+            stack[-1] += elapsed
+
+# Decorador: conta o tempo da função na etapa indicada
+def timed_stage(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
 # --- 1. Dados ---
 
+# Opções de leitura de cada CSV, compartilhadas pela carga completa, pela
+# leitura em blocos e pela leitura incremental
+FINANCIAL_CSV_OPTIONS = {'sep': ';', 'encoding': 'utf-8'}
+LOGISTICS_CSV_OPTIONS = {'sep': ',', 'encoding': 'utf-8'}
+SALES_CSV_OPTIONS = {'sep': ';', 'encoding': 'utf-8'}
+PERSONAL_EXPENSES_CSV_OPTIONS = {
+    'sep': ';', 'encoding': 'utf-8', 'names': ['Data', 'Categoria', 'Valor'],
+    'skiprows': 1, 'on_bad_lines': 'skip'
+}
+
+# Esquema compacto de cada conjunto, aplicado após a limpeza: textos de baixa
+# cardinalidade viram categóricos (códigos inteiros + dicionário; nulos, como
+# os códigos de exceção esparsos, ficam como código -1) e identificadores e
+# contagens inteiras são reduzidos ao menor inteiro que os comporta. Valores
+# monetários e pesos continuam em float64 para não alterar os totais.
+FINANCIAL_DTYPES = {
+    'category': ['Tipo', 'Categoria', 'Status Pagamento'],
+    'integer': ['ID Transação', 'ID Detalhe', 'Conta'],
+}
+LOGISTICS_DTYPES = {
+    'category': ['Operação', 'Tipo', 'Incoterm', 'Origem', 'ID País Destino', 'Local Destino',
+                 'Tipo de serviço', 'Cód. Exceção'],
+    'integer': ['ID Operador Logístico', 'Prazo Realizado', 'Prazo Contratado'],
+}
+SALES_DTYPES = {
+    'category': ['Produto'],
+    'integer': ['Quantidade'],
+}
+PERSONAL_EXPENSES_DTYPES = {
+    'category': ['Categoria'],
+}
+
+# Converte as colunas de um DataFrame limpo para o esquema compacto. Com
+# label, registra o uso de memória antes e depois da conversão.
+def compact_dtypes(df, dtypes, label=None):
+    if df.empty:
+        return df
+    before = df.memory_usage(deep=True).sum() if label else 0
+    for col in dtypes.get('category', []):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in dtypes.get('integer', []):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast='integer')  # Colunas com nulos permanecem float
+    if label:
+        after = df.memory_usage(deep=True).sum()
+        logger.info(f"Memória de {label}: {before / 2**20:.2f} MB -> {after / 2**20:.2f} MB ({1 - after / max(before, 1):.0%} menor)")
+    return df
+
+# Concatena blocos do mesmo CSV mantendo as colunas categóricas (blocos com
+# categorias diferentes seriam convertidos de volta para texto pelo concat).
+# Blocos em que a coluna é toda nula não têm categorias (e o tipo delas
+# difere do dos demais blocos): ficam fora da união e recebem o tipo unificado.
+def concat_frames(frames):
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    categorical = {}
+    for col, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            populated = [frame[col] for frame in frames if len(frame[col].cat.categories)]
+            if populated:
+                categorical[col] = pd.CategoricalDtype(pd.api.types.union_categoricals(populated).categories)
+    if categorical and len(frames) > 1:
+        frames = [frame.astype(categorical) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+# Função para limpar dados financeiros já lidos do CSV
+def clean_financial_data(df):
+    df.columns = [
+        'Data', 'ID Transação', 'Tipo', 'Categoria', 'ID Detalhe',
+        'Conta', 'Status Pagamento', 'Valor Formatado', 'Valor'
+    ]
+    df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
+    df['Tipo'] = df['Tipo'].str.strip()  # Remove espaços em branco
+    df['Valor'] = df['Valor'].astype(str).str.replace(' ', '', regex=False)
+    df['Valor'] = df['Valor'].str.replace('R$', '', regex=False)
+    df['Valor'] = df['Valor'].str.replace('.', '', regex=False)
+    df['Valor'] = df['Valor'].str.replace(',', '.', regex=False)
+    df['Valor'] = pd.to_numeric(df['Valor'], errors='coerce')
+    return df
+
 # Função para carregar e limpar dados financeiros
 def load_financial_data(file_path='csv/relatorio.csv'):
     try:
-        df = pd.read_csv(file_path, sep=';', encoding='utf-8')
-        df.columns = [
-            'Data', 'ID Transação', 'Tipo', 'Categoria', 'ID Detalhe',
-            'Conta', 'Status Pagamento', 'Valor Formatado', 'Valor'
-        ]
-        df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
-        df['Tipo'] = df['Tipo'].str.strip()  # Remove espaços em branco
-        df['Valor'] = df['Valor'].astype(str).str.replace(' ', '', regex=False)
-        df['Valor'] = df['Valor'].str.replace('R$', '', regex=False)
-        df['Valor'] = df['Valor'].str.replace('.', '', regex=False)
-        df['Valor'] = df['Valor'].str.replace(',', '.', regex=False)
-        df['Valor'] = pd.to_numeric(df['Valor'], errors='coerce')
+        df = clean_financial_data(pd.read_csv(file_path, **FINANCIAL_CSV_OPTIONS))
+        df = compact_dtypes(df, FINANCIAL_DTYPES, file_path)
         logger.info(f"Dados financeiros carregados de {file_path} com {len(df)} linhas")
         logger.info(f"Valores únicos em 'Tipo': {df['Tipo'].unique()}")
         return df
@@ -59,17 +262,78 @@ def load_sectors_data(file_path='csv/setores.csv'):
         logger.error(f"Erro ao carregar {file_path}: {str(e)}")
         return pd.DataFrame()
 
+# Função para carregar o cadastro de operadores logísticos (separado por tabulação)
+def load_carriers_data(file_path='csv/cadastro_de_operadores_logisticos.csv'):
+    try:
+        df = pd.read_csv(file_path, sep='\t', encoding='utf-8')
+        logger.info(f"Dados de operadores logísticos carregados de {file_path} com {len(df)} linhas")
+        return df
+    except FileNotFoundError:
+        logger.error(f"Arquivo {file_path} não encontrado")
+        return pd.DataFrame()
+    except Exception as e:
+        logger.error(f"Erro ao carregar {file_path}: {str(e)}")
+        return pd.DataFrame()
+
+# Função para carregar o cadastro de países de origem
+def load_countries_data(file_path='csv/bandeiras_paises.csv'):
+    try:
+        df = pd.read_csv(file_path, sep=';', encoding='utf-8')
+        logger.info(f"Dados de países carregados de {file_path} com {len(df)} linhas")
+        return df
+    except FileNotFoundError:
+        logger.error(f"Arquivo {file_path} não encontrado")
+        return pd.DataFrame()
+    except Exception as e:
+        logger.error(f"Erro ao carregar {file_path}: {str(e)}")
+        return pd.DataFrame()
+
+# Função para carregar o cadastro de códigos de exceção
+def load_exceptions_data(file_path='csv/cadastro_de_execoes.csv'):
+    try:
+        df = pd.read_csv(file_path, sep=';', encoding='utf-8')
+        logger.info(f"Dados de exceções carregados de {file_path} com {len(df)} linhas")
+        return df
+    except FileNotFoundError:
+        logger.error(f"Arquivo {file_path} não encontrado")
+        return pd.DataFrame()
+    except Exception as e:
+        logger.error(f"Erro ao carregar {file_path}: {str(e)}")
+        return pd.DataFrame()
+
+# Função para carregar o cadastro de produtos (colunas vazias ao final são ignoradas)
+def load_products_data(file_path='csv/produtos.csv'):
+    try:
+        df = pd.read_csv(file_path, sep=';', encoding='utf-8', usecols=[0, 1])
+        logger.info(f"Dados de produtos carregados de {file_path} com {len(df)} linhas")
+        return df
+    except FileNotFoundError:
+        logger.error(f"Arquivo {file_path} não encontrado")
+        return pd.DataFrame()
+    except Exception as e:
+        logger.error(f"Erro ao carregar {file_path}: {str(e)}")
+        return pd.DataFrame()
+
+# Código do país de uma origem de logística ('DE-Germany' -> 'DE', o ID País Origem de bandeiras_paises.csv)
+def origin_country_code(origem):
+    return origem.split('-', 1)[0]
+
+# Função para limpar dados de logística já lidos do CSV
+def clean_logistics_data(df):
+    df['Data da Coleta'] = pd.to_datetime(df['Data da Coleta'], format='%d/%m/%Y', errors='coerce')
+    df['Data da Entrega'] = pd.to_datetime(df['Data da Entrega'], format='%d/%m/%Y', errors='coerce')
+    df['Peso (kg)'] = pd.to_numeric(df['Peso (kg)'], errors='coerce')
+    df['Volume (cbm)'] = pd.to_numeric(df['Volume (cbm)'], errors='coerce')
+    df['Prazo Realizado'] = pd.to_numeric(df['Prazo Realizado'], errors='coerce')
+    df['Prazo Contratado'] = pd.to_numeric(df['Prazo Contratado'], errors='coerce')
+    return df
+
 # Função para carregar e limpar dados de logística
 def load_logistics_data(file_path='csv/historico_importacao.csv'):
     try:
-        df = pd.read_csv(file_path, sep=',', encoding='utf-8')
+        df = pd.read_csv(file_path, **LOGISTICS_CSV_OPTIONS)
         logger.info(f"Colunas em {file_path}: {list(df.columns)}")
-        df['Data da Coleta'] = pd.to_datetime(df['Data da Coleta'], format='%d/%m/%Y', errors='coerce')
-        df['Data da Entrega'] = pd.to_datetime(df['Data da Entrega'], format='%d/%m/%Y', errors='coerce')
-        df['Peso (kg)'] = pd.to_numeric(df['Peso (kg)'], errors='coerce')
-        df['Volume (cbm)'] = pd.to_numeric(df['Volume (cbm)'], errors='coerce')
-        df['Prazo Realizado'] = pd.to_numeric(df['Prazo Realizado'], errors='coerce')
-        df['Prazo Contratado'] = pd.to_numeric(df['Prazo Contratado'], errors='coerce')
+        df = compact_dtypes(clean_logistics_data(df), LOGISTICS_DTYPES, file_path)
         logger.info(f"Dados de logística carregados de {file_path} com {len(df)} linhas")
         return df
     except FileNotFoundError:
@@ -79,14 +343,19 @@ def load_logistics_data(file_path='csv/historico_importacao.csv'):
         logger.error(f"Erro ao carregar {file_path}: {str(e)}")
         return pd.DataFrame()
 
+# Função para limpar dados de vendas já lidos do CSV
+def clean_sales_data(df):
+    df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
+    df['Data_Entrega'] = pd.to_datetime(df['Data_Entrega'], format='%d/%m/%Y', errors='coerce')
+    df['Quantidade'] = pd.to_numeric(df['Quantidade'], errors='coerce')
+    df['Total'] = pd.to_numeric(df['Total'], errors='coerce')
+    return df
+
 # Função para carregar e limpar dados de vendas
 def load_sales_data(file_path='csv/pedidos.csv'):
     try:
-        df = pd.read_csv(file_path, sep=';', encoding='utf-8')
-        df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
-        df['Data_Entrega'] = pd.to_datetime(df['Data_Entrega'], format='%d/%m/%Y', errors='coerce')
-        df['Quantidade'] = pd.to_numeric(df['Quantidade'], errors='coerce')
-        df['Total'] = pd.to_numeric(df['Total'], errors='coerce')
+        df = clean_sales_data(pd.read_csv(file_path, **SALES_CSV_OPTIONS))
+        df = compact_dtypes(df, SALES_DTYPES, file_path)
         logger.info(f"Dados de vendas carregados de {file_path} com {len(df)} linhas")
         return df
     except FileNotFoundError:
@@ -96,14 +365,1269 @@ def load_sales_data(file_path='csv/pedidos.csv'):
         logger.error(f"Erro ao carregar {file_path}: {str(e)}")
         return pd.DataFrame()
 
-# Carregar os dados
-df_financeiro = load_financial_data()
-df_setor = load_sectors_data()
-df_logistica = load_logistics_data()
-df_vendas = load_sales_data()
+# Função para transformar Saídas em valores positivos para visualização
+# (operação vetorizada sobre a coluna inteira, sem laço por linha)
+def positive_outflows(df):
+    df = df.copy()
+    df['Valor'] = df['Valor'].mask(df['Tipo'] == 'Saídas', df['Valor'].abs())
+    return df
+
+# --- Agregados Pré-calculados ---
+# Cada carregador tem um agregador que monta, uma única vez por carga, os cubos
+# lidos pelos layouts (somas mensais, por categoria, por setor, diárias e KPIs).
+
+# Resultado de um agrupamento sobre colunas categóricas (observed=True) com o
+# índice de volta em texto simples, como nos cubos de cargas anteriores;
+# contagens de value_counts perdem as categorias sem ocorrência.
+def plain_index(result):
+    if isinstance(result, pd.Series) and result.name == 'count':
+        result = result[result > 0]
+    index = result.index
+    if isinstance(index, pd.MultiIndex):
+        result.index = index.set_levels([
+            level.astype(level.categories.dtype) if isinstance(level, pd.CategoricalIndex) else level
+            for level in index.levels
+        ])
+    elif isinstance(index, pd.CategoricalIndex):
+        result.index = index.astype(index.categories.dtype)
+    return result
+
+# Agregados do relatório financeiro (Dashboards Geral, Financeiro e Despesas)
+def build_financial_aggregates(df):
+    df_plot = positive_outflows(df)
+    df_despesas = df_plot[df_plot['Tipo'] == 'Saídas']
+    return {
+        'kpis': {
+            'total_valor': df['Valor'].sum(),
+            'total_entradas': df[df['Tipo'] == 'Entradas']['Valor'].sum(),
+            'total_saidas': df[df['Tipo'] == 'Saídas']['Valor'].sum(),
+            'despesas_total': df_despesas['Valor'].sum(),
+            'despesas_validas': df_despesas['Valor'].count(),
+            'despesas_transacoes': len(df_despesas),
+        },
+        # Entradas e Saídas (positivas) por mês e Tipo
+        'mensal_tipo': plain_index(df_plot.groupby([pd.Grouper(key='Data', freq='ME'), 'Tipo'], observed=True)['Valor'].sum()),
+        # Saldo líquido por mês
+        'mensal_saldo': df.set_index('Data').resample('ME')['Valor'].sum(),
+        'categoria_tipo': plain_index(df_plot.groupby(['Tipo', 'Categoria'], observed=True)['Valor'].sum()),
+        # Saídas por centro de custo, associadas ao setor na renderização
+        'saidas_conta': df_despesas.groupby('Conta')['Valor'].sum(),
+        'saidas_mensal': df_despesas.groupby(pd.Grouper(key='Data', freq='ME'))['Valor'].sum(),
+        'saidas_categoria': plain_index(df_despesas.groupby('Categoria', observed=True)['Valor'].sum()),
+        'saidas_categoria_contagem': plain_index(df_despesas['Categoria'].value_counts()),
+        'saidas_diario': df_despesas.groupby('Data')['Valor'].sum(),
+    }
+
+# Dimensões das métricas de logística: código de cada embarque por dimensão
+# (os nomes vêm dos cadastros na derivação, ver logistics_metrics)
+def logistics_dimensions(df):
+    return {
+        'modal': df['Tipo'],
+        'operador': df['ID Operador Logístico'].astype(str),
+        'origem': df['Origem'].map(origin_country_code),
+        'excecao': df['Cód. Exceção'],
+    }
+
+# Cubos aditivos das métricas de logística por dimensão e valor: contagens e
+# somas (OTD, lead time e atraso) e o histograma do lead time em dias, do
+# qual saem os percentis. Por serem somas, são acumulados pela leitura em
+# blocos e pela ingestão incremental como os demais agregados.
+def build_logistics_metric_cubes(df):
+    lead_time = (df['Data da Entrega'] - df['Data da Coleta']).dt.days
+    atraso = (df['Prazo Realizado'].astype('float64') - df['Prazo Contratado'].astype('float64')).clip(lower=0)
+    base = pd.DataFrame({
+        'embarques': 1,
+        'no_prazo': (df['Prazo Realizado'] <= df['Prazo Contratado']).astype('int64'),
+        'lead_time_soma': lead_time,
+        'lead_time_contagem': lead_time.notna().astype('int64'),
+        'atraso_soma': atraso,
+        'atrasados': (atraso > 0).astype('int64'),
+    }, index=df.index)
+    cubos, histogramas = [], []
+    for dimensao, chave in logistics_dimensions(df).items():
+        chave = chave.astype(str).where(chave.notna())  # Códigos como texto, nulos fora dos grupos
+        cubos.append(base.groupby(chave.rename('valor')).sum())
+        histogramas.append(lead_time.groupby([chave.rename('valor'), lead_time.rename('dias')]).size())
+    return {
+        'metricas_base': pd.concat(cubos, keys=list(logistics_dimensions(df)), names=['dimensao']),
+        'lead_time_dias': pd.concat(histogramas, keys=list(logistics_dimensions(df)), names=['dimensao']).rename('embarques'),
+    }
+
+# Percentil do lead time de cada (dimensão, valor) a partir do histograma em dias
+def _histogram_percentile(histograma, q):
+    histograma = histograma.sort_index()
+    grupos = histograma.groupby(level=['dimensao', 'valor'])
+    fracao = grupos.cumsum() / grupos.transform('sum')
+    return fracao[fracao >= q].reset_index('dias').groupby(level=['dimensao', 'valor'])['dias'].first()
+
+# Métricas de logística por dimensão (modal, operador, país de origem e
+# código de exceção): OTD, lead time médio/P50/P90 e dias de atraso, com os
+# nomes dos cadastros. Devolve um mapeamento somente leitura de DataFrames.
+@timed_stage('agregacao')
+def logistics_metrics(agregados):
+    base = agregados['metricas_base']
+    metricas = pd.DataFrame({
+        'Embarques': base['embarques'],
+        'OTD (%)': base['no_prazo'] / base['embarques'] * 100,
+        'Lead Time Médio (dias)': base['lead_time_soma'] / base['lead_time_contagem'].where(base['lead_time_contagem'] > 0),
+        'Lead Time P50 (dias)': _histogram_percentile(agregados['lead_time_dias'], 0.5),
+        'Lead Time P90 (dias)': _histogram_percentile(agregados['lead_time_dias'], 0.9),
+        'Atraso Médio (dias)': base['atraso_soma'] / base['embarques'],
+        'Embarques Atrasados (%)': base['atrasados'] / base['embarques'] * 100,
+    }, index=base.index)
+    resultado = {}
+    # Cadastro (ver DIMENSIONS) de onde vem o nome de cada dimensão
+    for dimensao, cadastro in {'modal': None, 'operador': 'operador', 'origem': 'pais', 'excecao': 'excecao'}.items():
+        frame = metricas.xs(dimensao, level='dimensao') if dimensao in metricas.index.get_level_values('dimensao') else metricas.iloc[0:0].droplevel('dimensao')
+        frame = frame.reset_index().rename(columns={'valor': 'Código'})
+        chaves = pd.to_numeric(frame['Código'], errors='coerce') if dimensao == 'operador' else frame['Código']
+        nomes = frame['Código'] if cadastro is None else dimension_values(cadastro, chaves).astype(object).fillna(frame['Código'])
+        frame.insert(1, 'Nome', nomes)
+        if dimensao == 'excecao':
+            frame.insert(2, 'Responsável', dimension_values('excecao', chaves, 'Responsável').astype(object))
+        resultado[dimensao] = frame
+    return types.MappingProxyType(resultado)
+
+_logistics_metrics_cache = (None, None, None)  # (agregados, versões dos cadastros, métricas)
+
+# Métricas do conjunto publicado, derivadas uma vez por versão dos dados e
+# dos cadastros; as requisições só leem o resultado
+def get_logistics_metrics():
+    global _logistics_metrics_cache
+    agregados = get_aggregates('logistica')
+    versoes = tuple(dataset_version(name) for name in ('operadores', 'paises', 'excecoes'))
+    cached_aggregates, cached_versions, metricas = _logistics_metrics_cache
+    if cached_aggregates is agregados and cached_versions == versoes:
+        return metricas
+    metricas = logistics_metrics(agregados)
+    _logistics_metrics_cache = (agregados, versoes, metricas)
+    return metricas
+
+# Agregados de logística: KPIs, tipos de serviço, OTD por modal e cubos das métricas
+def build_logistics_aggregates(df):
+    tipo_col = 'Tipo de serviço'
+    if tipo_col not in df.columns:
+        logger.warning(f"Coluna '{tipo_col}' não encontrada em df_logistica. Colunas disponíveis: {list(df.columns)}")
+        tipo_servico = None
+    else:
+        tipo_servico = plain_index(df[tipo_col].value_counts())
+    # On Time Delivery: embarques no prazo e total por modal
+    otd = df['Prazo Realizado'] <= df['Prazo Contratado']
+    return {
+        'kpis': {
+            'total_envios': len(df),
+            'peso_total': df['Peso (kg)'].sum(),  # Usando peso como proxy para custo
+        },
+        'tipo_servico': tipo_servico,
+        'otd_tipo': plain_index(otd.groupby(df['Tipo'], observed=True).agg(['sum', 'count']).rename(columns={'sum': 'no_prazo', 'count': 'embarques'})),
+        **build_logistics_metric_cubes(df),
+    }
+
+# Agregados de vendas: totais, vendas por produto e volume mensal
+def build_sales_aggregates(df):
+    return {
+        'kpis': {
+            'total_vendas': df['Total'].sum(),
+            'total_quantidade': df['Quantidade'].sum(),
+        },
+        'produto': plain_index(df.groupby('Produto', observed=True)['Total'].sum()),
+        'mensal_quantidade': df.groupby(pd.Grouper(key='Data', freq='ME'))['Quantidade'].sum(),
+    }
+
+# --- Ingestão Incremental ---
+# relatorio.csv e historico_importacao.csv só crescem por linhas acrescentadas
+# ao final. Para eles guardamos um cursor (deslocamento em bytes já processado,
+# número de linhas e uma impressão digital dos últimos bytes lidos); na recarga
+# apenas o trecho novo é lido, limpo e agregado, e os cubos são somados aos
+# existentes. Se o arquivo foi reescrito, volta-se à carga completa.
+
+Cursor = namedtuple('Cursor', ['offset', 'rows', 'fingerprint'])
+
+# Impressão digital dos bytes imediatamente anteriores ao deslocamento
+def _fingerprint(file_path, offset, size=4096):
+    with open(file_path, 'rb') as file:
+        file.seek(max(0, offset - size))
+        return zlib.crc32(file.read(min(offset, size)))
+
+# Cursor do arquivo inteiro, válido apenas se ele termina em quebra de linha
+# (uma última linha sem quebra seria lida de novo no próximo acréscimo)
+def file_cursor(file_path, version, rows):
+    if version is None or version[1] == 0:
+        return None
+    with open(file_path, 'rb') as file:
+        file.seek(version[1] - 1)
+        if file.read(1) != b'\n':
+            return None
+    return Cursor(version[1], rows, _fingerprint(file_path, version[1]))
+
+# Verifica se o arquivo apenas cresceu (ou só teve o mtime alterado) desde o cursor
+def is_append_only(file_path, cursor, version):
+    if cursor is None or version is None or version[1] < cursor.offset:
+        return False
+    return _fingerprint(file_path, cursor.offset) == cursor.fingerprint
+
+# Lê as linhas acrescentadas após o deslocamento, com o mesmo cabeçalho e a
+# mesma limpeza da carga completa. Uma última linha ainda incompleta é deixada
+# para a próxima recarga.
+def read_csv_tail(file_path, offset, cleaner, read_options, dtypes=None):
+    with open(file_path, 'rb') as file:
+        header = file.readline()
+        file.seek(offset)
+        data = file.read()
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return None, offset
+    df = pd.read_csv(io.BytesIO(header + data[:end]), **read_options)
+    return compact_dtypes(cleaner(df), dtypes or {}), offset + end
+
+# Soma os cubos de um trecho novo aos cubos existentes
+def merge_aggregates(old, new):
+    merged = {}
+    for key, value in old.items():
+        other = new.get(key)
+        if isinstance(value, dict):
+            merged[key] = {k: v + other.get(k, 0) for k, v in value.items()}
+        elif value is None or other is None:
+            merged[key] = value if other is None else other
+        else:
+            combined = value.add(other, fill_value=0)
+            if getattr(value.index, 'freq', None) is not None:
+                # Séries mensais (Grouper/resample) incluem os meses sem movimento
+                full_range = pd.date_range(combined.index.min(), combined.index.max(), freq=value.index.freq, name=combined.index.name)
+                combined = combined.reindex(full_range, fill_value=0)
+            # Contagens voltam a inteiro após o alinhamento com fill_value
+            if isinstance(value, pd.Series) and value.dtype.kind in 'iu':
+                combined = combined.astype(value.dtype)
+            elif isinstance(value, pd.DataFrame):
+                combined = combined.astype({col: dtype for col, dtype in value.dtypes.items() if dtype.kind in 'iu'})
+            if isinstance(value, pd.Series) and value.name == 'count':
+                combined = combined.sort_values(ascending=False)  # Mantém a ordem de value_counts
+            merged[key] = combined
+    return merged
+
+# --- Leitura em Blocos ---
+# CSVs grandes são lidos em blocos de CSV_CHUNK_ROWS linhas: cada bloco é limpo
+# e agregado (os cubos de cada bloco são somados com merge_aggregates) antes
+# de ler o próximo. Com CSV_STREAM_KEEP_ROWS=0 apenas os agregados são mantidos
+# e o pico de memória fica limitado a um bloco, permitindo ingerir exportações
+# de vários GB em contêineres pequenos.
+
+CSV_CHUNK_ROWS = int(os.environ.get('CSV_CHUNK_ROWS', '200000'))
+CSV_STREAM_MIN_MB = float(os.environ.get('CSV_STREAM_MIN_MB', '64'))
+CSV_STREAM_KEEP_ROWS = os.environ.get('CSV_STREAM_KEEP_ROWS', '1') == '1'
+
+# Conta as linhas de um arquivo lendo-o em blocos de bytes
+def count_lines(file_path, block_size=1 << 20):
+    lines = 0
+    last = b'\n'
+    with open(file_path, 'rb') as file:
+        while block := file.read(block_size):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    return lines + (last != b'\n')
+
+# Lê, limpa e agrega um CSV bloco a bloco, registrando o progresso
+def stream_csv(file_path, cleaner, read_options, aggregator=None, dtypes=None,
+               keep_rows=CSV_STREAM_KEEP_ROWS, chunk_rows=CSV_CHUNK_ROWS, progress=None):
+    total_bytes = os.path.getsize(file_path)
+    chunks, aggregates, rows = [], None, 0
+    with open(file_path, 'rb') as file:
+        for chunk in pd.read_csv(file, chunksize=chunk_rows, **read_options):
+            chunk = compact_dtypes(cleaner(chunk), dtypes or {})
+            rows += len(chunk)
+            if aggregator is not None and not chunk.empty:
+                partial_aggregates = aggregator(chunk)
+                aggregates = partial_aggregates if aggregates is None else merge_aggregates(aggregates, partial_aggregates)
+            if keep_rows:
+                chunks.append(chunk)
+            logger.info(f"{file_path}: {rows} linhas processadas ({file.tell() / max(total_bytes, 1):.0%})")
+            if progress is not None:
+                progress(file.tell() / max(total_bytes, 1), rows)
+    df = concat_frames(chunks)
+    logger.info(f"Leitura em blocos de {file_path} concluída com {rows} linhas ({df.memory_usage(deep=True).sum() / 2**20:.2f} MB em memória)")
+    return df, aggregates
+
+# --- Ingestão Paralela ---
+# Na partida a frio, os CSVs independentes são lidos, limpos e agregados ao
+# mesmo tempo num pool de processos (fora do GIL), e CSVs grandes são
+# divididos em faixas de linhas (cortadas em quebras de linha) processadas em
+# paralelo e concatenadas na ordem do arquivo. Cada processo devolve o
+# DataFrame limpo como buffer Arrow IPC e os agregados parciais, somados com
+# merge_aggregates. O pool só é usado quando o volume a ler passa de
+# CSV_PARALLEL_MIN_MB: abaixo disso, iniciar os processos custa mais que o ganho.
+
+DATA_LOAD_WORKERS = int(os.environ.get('DATA_LOAD_WORKERS', str(min(4, os.cpu_count() or 1))))
+CSV_PARALLEL_MIN_MB = float(os.environ.get('CSV_PARALLEL_MIN_MB', '32'))
+
+# Pool de ingestão; 'spawn' evita herdar locks de outras threads do processo
+def ingestion_pool():
+    return ProcessPoolExecutor(max_workers=DATA_LOAD_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+# Faixas de bytes [início, fim) de um CSV após o cabeçalho, alinhadas a quebras de linha
+def csv_row_ranges(file_path, parts):
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as file:
+        file.readline()
+        bounds = [file.tell()]
+        for i in range(1, parts):
+            file.seek(max(bounds[-1], bounds[0] + (size - bounds[0]) * i // parts))
+            file.readline()  # Avança até o fim da linha em curso
+            bounds.append(min(file.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+# Lê e limpa uma faixa de bytes de um CSV com o mesmo cabeçalho e as mesmas opções da carga completa
+def read_csv_range(spec, start, end):
+    with open(spec.file_path, 'rb') as file:
+        header = file.readline()
+        file.seek(start)
+        data = file.read(end - start)
+    df = pd.read_csv(io.BytesIO(header + data), **spec.read_options)
+    return compact_dtypes(spec.cleaner(df), spec.dtypes or {})
+
+# DataFrame como buffer Arrow IPC (colunas contíguas, sem serializar objeto a
+# objeto); sem pyarrow, o próprio DataFrame segue por pickle
+def _to_arrow_buffer(df):
+    if pa is None or df.empty:
+        return df
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+def _from_arrow_buffer(data):
+    if isinstance(data, pd.DataFrame):
+        return data
+    return pa.ipc.open_stream(data).read_all().to_pandas(split_blocks=True)
+
+# Tarefa do pool: DataFrame limpo (arquivo inteiro pelo carregador ou uma faixa) e seus agregados
+def _ingest_task(spec, start=None, end=None):
+    df = spec.loader(spec.file_path) if start is None else read_csv_range(spec, start, end)
+    aggregates = spec.aggregator(df) if spec.aggregator is not None and not df.empty else None
+    return _to_arrow_buffer(df), aggregates
+
+# Envia ao pool as tarefas de um conjunto: faixas de linhas para CSVs grandes
+def submit_ingestion(pool, spec, version):
+    if spec.cleaner is not None and version[1] >= CSV_PARALLEL_MIN_MB * 2**20:
+        return [pool.submit(_ingest_task, spec, start, end) for start, end in csv_row_ranges(spec.file_path, DATA_LOAD_WORKERS)]
+    return [pool.submit(_ingest_task, spec)]
+
+# Junta, na ordem do arquivo, os resultados das tarefas de um conjunto
+def combine_ingestion(futures):
+    frames, aggregates = [], None
+    for future in futures:
+        data, partial_aggregates = future.result()
+        frames.append(_from_arrow_buffer(data))
+        if partial_aggregates is not None:
+            aggregates = partial_aggregates if aggregates is None else merge_aggregates(aggregates, partial_aggregates)
+    return concat_frames(frames), aggregates
+
+# Indica se vale ler o CSV de um conjunto em faixas paralelas
+def use_parallel_read(spec, version):
+    return (DATA_LOAD_WORKERS > 1 and spec.cleaner is not None and version is not None and CSV_STREAM_KEEP_ROWS
+            and version[1] >= CSV_PARALLEL_MIN_MB * 2**20)
+
+# --- Partições Mensais ---
+# Com DATA_PARTITIONS=1 (requer pyarrow), cada fato com coluna de data
+# (relatorio.csv, historico_importacao.csv e despesas.csv) ganha, ao lado do
+# CSV, um armazenamento particionado por ano e mês (ex.: csv/relatorio/2021/01.feather):
+# as linhas limpas e tipadas do mês, sem as colunas dos cadastros, em formato
+# colunar comprimido (zstd), e os agregados do mês (01.agregados.pkl).
+# _particoes.json registra a versão do CSV e, por mês, linhas, hash, primeira
+# e última data e os valores dos campos de filtro. Meses fechados não são
+# regravados (só se o conteúdo mudar numa reescrita do CSV) e um acréscimo de
+# linhas regrava só os meses que toca. Com as partições atuais, a carga não
+# lê nenhuma linha: os agregados são a soma dos agregados mensais, e os
+# filtros de período leem apenas os meses do intervalo.
+
+DATA_PARTITIONS = os.environ.get('DATA_PARTITIONS', '0') == '1'
+PARTITION_MANIFEST = '_particoes.json'
+UNDATED_PARTITION = 'sem-data'  # Linhas sem data válida
+
+# Indica se o conjunto usa as partições mensais
+def use_partitions(spec):
+    return DATA_PARTITIONS and feather is not None and spec.partition_column is not None and not uses_database(spec)
+
+def partition_dir(spec):
+    return os.path.splitext(spec.file_path)[0]
+
+# Arquivo de uma partição ('2021-01' -> csv/relatorio/2021/01.feather)
+def partition_path(spec, month, suffix='.feather'):
+    if month == UNDATED_PARTITION:
+        return os.path.join(partition_dir(spec), month + suffix)
+    year, number = month.split('-')
+    return os.path.join(partition_dir(spec), year, number + suffix)
+
+def read_partition_manifest(spec):
+    try:
+        with open(os.path.join(partition_dir(spec), PARTITION_MANIFEST), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+# Manifesto das partições, se elas correspondem à versão do CSV (None se não)
+def current_partitions(spec, version):
+    manifest = read_partition_manifest(spec)
+    if manifest is None or version is None or manifest.get('versao') != list(version):
+        return None
+    return manifest
+
+# Colunas cujos valores distintos são registrados por mês: as dos campos de
+# filtro das páginas do conjunto (a chave, para colunas associadas a um cadastro)
+def partition_filter_columns(name, spec):
+    columns = []
+    for config in PAGE_FILTERS.values():
+        if config['dataset'] != name:
+            continue
+        for _, column in config['fields'].values():
+            column = spec.dimensions[column][1] if column in (spec.dimensions or {}) else column
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+def _write_manifest(path, manifest):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=1)
+
+def _write_partition_file(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)  # Leitores nunca veem a partição incompleta
+
+# Grava as linhas de df nas partições mensais. Na carga completa, df traz
+# todas as linhas e só os meses com conteúdo diferente são regravados (os
+# meses que sumiram do CSV são removidos); com append=True, df traz só as
+# linhas acrescentadas, somadas às partições dos meses que elas tocam.
+def write_partitions(name, spec, df, version, append=False):
+    start = time.perf_counter()
+    manifest = read_partition_manifest(spec) or {}
+    months = dict(manifest.get('meses', {}))
+    keys = df[spec.partition_column].dt.strftime('%Y-%m').fillna(UNDATED_PARTITION).to_numpy()
+    groups = pd.Series(keys).groupby(keys, sort=True).indices
+    latest = max((month for month in groups if month != UNDATED_PARTITION), default=None)
+    filter_columns = [column for column in partition_filter_columns(name, spec) if column in df.columns]
+    written = 0
+    for month, positions in groups.items():
+        rows = df.take(positions).reset_index(drop=True)
+        if append and month in months and os.path.exists(partition_path(spec, month)):
+            rows = concat_frames([read_partition(spec, month), rows])
+        digest = zlib.crc32(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+        if months.get(month, {}).get('hash') == digest and os.path.exists(partition_path(spec, month)):
+            continue
+        if month in months and month != latest:
+            logger.warning(f"Partição fechada {partition_path(spec, month)} mudou no CSV; regravando")
+        _write_partition_file(partition_path(spec, month),
+                              lambda path: feather.write_feather(rows, path, compression='zstd'))
+        if spec.aggregator is not None:
+            _write_partition_file(partition_path(spec, month, '.agregados.pkl'),
+                                  lambda path: pd.to_pickle(spec.aggregator(rows), path))
+        dates = rows[spec.partition_column].dropna()
+        months[month] = {
+            'linhas': len(rows), 'hash': digest,
+            'inicio': dates.min().isoformat() if not dates.empty else None,
+            'fim': dates.max().isoformat() if not dates.empty else None,
+            'valores': {column: pd.Series(rows[column].dropna().unique()).tolist() for column in filter_columns},
+        }
+        written += 1
+    if not append:
+        for month in [month for month in months if month not in groups]:
+            for suffix in ('.feather', '.agregados.pkl'):
+                if os.path.exists(partition_path(spec, month, suffix)):
+                    os.remove(partition_path(spec, month, suffix))
+            del months[month]
+    _write_partition_file(os.path.join(partition_dir(spec), PARTITION_MANIFEST),
+                          lambda path: _write_manifest(path, {'versao': list(version), 'meses': months}))
+    logger.info(f"Partições de {spec.file_path}: {written} de {len(groups)} meses gravados "
+                f"em {time.perf_counter() - start:.2f}s")
+
+def read_partition(spec, month):
+    return feather.read_table(partition_path(spec, month), memory_map=True).to_pandas()
+
+# Agregados do conjunto como soma dos agregados mensais (None se as partições
+# não correspondem à versão do CSV)
+def read_partition_aggregates(spec, version):
+    manifest = current_partitions(spec, version)
+    if manifest is None or not manifest['meses'] or spec.aggregator is None:
+        return None
+    try:
+        monthly = [pd.read_pickle(partition_path(spec, month, '.agregados.pkl')) for month in sorted(manifest['meses'])]
+    except Exception as e:
+        logger.warning(f"Partições de {spec.file_path} ilegíveis, lendo o CSV: {str(e)}")
+        return None
+    aggregates = monthly[0]
+    for partial_aggregates in monthly[1:]:
+        aggregates = merge_aggregates(aggregates, partial_aggregates)
+    logger.info(f"Agregados de {spec.file_path} lidos de {len(monthly)} partições mensais")
+    return aggregates
+
+# Linhas das partições que cruzam o período [start, end) (todas, sem período);
+# a partição das linhas sem data só entra sem período
+def read_partitions(spec, manifest, start=None, end=None):
+    months = []
+    for month, info in sorted(manifest['meses'].items()):
+        if start is None and end is None:
+            months.append(month)
+        elif month != UNDATED_PARTITION and (start is None or pd.Timestamp(info['fim']) >= pd.Timestamp(start)) \
+                and (end is None or pd.Timestamp(info['inicio']) < pd.Timestamp(end)):
+            months.append(month)
+    size = sum(os.path.getsize(partition_path(spec, month)) for month in months)
+    logger.info(f"{spec.file_path}: {len(months)} de {len(manifest['meses'])} partições lidas ({size / 2**20:.2f} MB)")
+    if not months:
+        # Nenhum mês no período: tabela vazia com as colunas das partições
+        first = min(manifest['meses'])
+        return feather.read_table(partition_path(spec, first), memory_map=True).slice(0, 0).to_pandas()
+    return concat_frames([read_partition(spec, month) for month in months])
+
+# Linhas do período e dos valores selecionados de uma página, lidas das
+# partições (usado quando o conjunto publicado não retém linhas)
+def partition_rows(page, manifest, start=None, end=None, selections=None):
+    config = PAGE_FILTERS[page]
+    spec = _dataset_loaders[config['dataset']]
+    pruned = config['date_column'] == spec.partition_column
+    df = read_partitions(spec, manifest, start if pruned else None, end if pruned else None)
+    df = enrich_with_dimensions(df, spec.dimensions)
+    if df.empty:
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (df[config['date_column']] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (df[config['date_column']] < pd.Timestamp(end)).to_numpy()
+    for campo, values in (selections or {}).items():
+        mask &= df[config['fields'][campo][1]].isin(values).to_numpy()
+    return df[mask]
+
+# Datas e valores dos campos de filtro de uma página, pelo manifesto das partições
+def partition_domain(page, manifest):
+    config = PAGE_FILTERS[page]
+    spec = _dataset_loaders[config['dataset']]
+    first, last = None, None
+    if config['date_column'] == spec.partition_column:
+        starts = [info['inicio'] for info in manifest['meses'].values() if info['inicio'] is not None]
+        ends = [info['fim'] for info in manifest['meses'].values() if info['fim'] is not None]
+        first, last = (pd.Timestamp(min(starts)), pd.Timestamp(max(ends))) if starts else (None, None)
+    values = {}
+    for campo, (_, column) in config['fields'].items():
+        dimension, key_column = None, column
+        if column in (spec.dimensions or {}):
+            dimension, key_column, _ = spec.dimensions[column]
+        keys = pd.Series([value for info in manifest['meses'].values() for value in info['valores'].get(key_column, [])])
+        values[campo] = (keys if dimension is None else dimension_values(dimension, keys)).dropna().unique()
+    return first, last, values
+
+# --- Banco Analítico (SQLite) ---
+# Com DATA_BACKEND=sqlite, os fatos (financeiro, logística, vendas e despesas
+# Gestor) são ingeridos em blocos num arquivo SQLite (DATA_DB_PATH) e os
+# agrupamentos dos layouts (mensais, por categoria, por setor, OTD por modal,
+# métricas de logística) rodam como SQL, devolvendo os mesmos cubos dos
+# agregadores em pandas: os layouts não mudam e nenhuma linha fica em memória.
+# O arquivo é compartilhado por todos os workers: a versão do CSV e o cursor
+# da ingestão ficam na tabela _ingestao e a ingestão roda numa transação
+# exclusiva, de modo que cada alteração do CSV é ingerida por um único
+# processo (só as linhas acrescentadas, quando possível) e os demais apenas
+# consultam. Os filtros das páginas viram cláusulas WHERE.
+
+DATA_BACKEND = os.environ.get('DATA_BACKEND', 'pandas')  # 'pandas' ou 'sqlite'
+DATA_DB_PATH = os.environ.get('DATA_DB_PATH', 'csv/analytics.sqlite')
+
+_db_local = threading.local()
+
+# Conexão da thread atual com o banco (refeita após um fork: conexões SQLite
+# não podem passar de um processo para outro)
+def db_connection():
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None or _db_local.pid != os.getpid():
+        conn = sqlite3.connect(DATA_DB_PATH, timeout=60, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')  # Consultas não esperam a ingestão
+        conn.execute('CREATE TABLE IF NOT EXISTS _ingestao (tabela TEXT PRIMARY KEY, versao TEXT, deslocamento INTEGER, impressao INTEGER)')
+        _db_local.conn, _db_local.pid = conn, os.getpid()
+    return conn
+
+# Nome de tabela ou coluna entre aspas (as colunas dos CSVs têm espaços e acentos)
+def _q(name):
+    return '"' + name.replace('"', '""') + '"'
+
+# Tipo SQLite de uma coluna do DataFrame limpo (datas ficam como texto AAAA-MM-DD)
+def _sql_type(dtype):
+    if dtype.kind in 'iub':
+        return 'INTEGER'
+    if dtype.kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+# Linhas de um bloco limpo prontas para o SQLite: datas em texto ISO e nulos como None
+def _sql_rows(df):
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype.kind == 'M':
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+    df = df.astype(object)
+    return df.where(df.notna(), None).itertuples(index=False, name=None)
+
+# Grava um bloco limpo na tabela, criando-a no primeiro bloco
+def _db_insert(conn, table, df):
+    columns = ', '.join(_q(col) for col in df.columns)
+    definitions = ', '.join(f"{_q(col)} {_sql_type(dtype)}" for col, dtype in df.dtypes.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {_q(table)} ({definitions})")
+    conn.executemany(f"INSERT INTO {_q(table)} ({columns}) VALUES ({', '.join('?' * len(df.columns))})", _sql_rows(df))
+
+# Ingere o CSV inteiro em blocos e indexa a data e os campos de filtro das páginas
+def ingest_csv(conn, name, spec):
+    rows = 0
+    with open(spec.file_path, 'rb') as file:
+        for chunk in pd.read_csv(file, chunksize=CSV_CHUNK_ROWS, **spec.read_options):
+            chunk = spec.cleaner(chunk)
+            _db_insert(conn, name, chunk)
+            rows += len(chunk)
+            logger.info(f"{spec.file_path}: {rows} linhas ingeridas em {DATA_DB_PATH}")
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({_q(name)})")}
+    for config in PAGE_FILTERS.values():
+        if config['dataset'] == name:
+            for column in [config['date_column']] + [column for _, column in config['fields'].values()]:
+                if column in columns:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {_q(f'ix_{name}_{column}')} ON {_q(name)} ({_q(column)})")
+    return rows
+
+# Leva a tabela de um conjunto à versão atual do CSV, se outro processo ainda
+# não o fez: só as linhas novas se o arquivo apenas cresceu desde o cursor
+# gravado, ou o arquivo inteiro. Retorna False se a tabela já estava em dia.
+def sync_table(name, spec, version):
+    if version is None:
+        return False  # CSV ausente (ex.: em cópia): mantém a tabela atual
+    conn = db_connection()
+    key = f"{version[0]}:{version[1]}"
+    conn.execute('BEGIN IMMEDIATE')  # Um processo por vez; os demais esperam e encontram a versão gravada
+    try:
+        row = conn.execute('SELECT versao, deslocamento, impressao FROM _ingestao WHERE tabela = ?', (name,)).fetchone()
+        if row is not None and row[0] == key:
+            conn.execute('COMMIT')
+            return False
+        cursor = Cursor(row[1], None, row[2]) if row is not None and row[1] is not None else None
+        if spec.incremental and is_append_only(spec.file_path, cursor, version):
+            df_tail, offset = read_csv_tail(spec.file_path, cursor.offset, spec.cleaner, spec.read_options)
+            if df_tail is not None and not df_tail.empty:
+                _db_insert(conn, name, df_tail)
+                logger.info(f"'{name}': {len(df_tail)} linhas acrescentadas em {DATA_DB_PATH}")
+        else:
+            conn.execute(f"DROP TABLE IF EXISTS {_q(name)}")
+            rows = ingest_csv(conn, name, spec)
+            cursor = file_cursor(spec.file_path, version, rows) if file_version(spec.file_path) == version else None
+            offset = None if cursor is None else cursor.offset
+        fingerprint = None if offset is None else _fingerprint(spec.file_path, offset)
+        conn.execute('INSERT OR REPLACE INTO _ingestao VALUES (?, ?, ?, ?)', (name, key, offset, fingerprint))
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return True
+
+# Série mensal (fim de mês, incluindo os meses sem movimento) a partir de somas por 'AAAA-MM'
+def _sql_monthly(frame, name):
+    if frame.empty:
+        return pd.Series([], index=pd.DatetimeIndex([], name='Data', freq='ME'), name=name, dtype='float64')
+    index = pd.DatetimeIndex(pd.to_datetime(frame['mes'] + '-01') + pd.offsets.MonthEnd(0), name='Data')
+    series = pd.Series(frame['total'].to_numpy(), index=index, name=name)
+    return series.reindex(pd.date_range(index.min(), index.max(), freq='ME', name='Data'), fill_value=0)
+
+# Série de uma consulta agrupada: colunas de chave no índice (datas convertidas)
+def _sql_series(conn, sql, params, keys, name):
+    frame = pd.read_sql_query(sql, conn, params=list(params))
+    for key in keys:
+        if key == 'Data':
+            frame[key] = pd.to_datetime(frame[key])
+    return frame.set_index(keys)[name]
+
+# Agregados do relatório financeiro calculados no banco (mesmos cubos de build_financial_aggregates)
+def sql_financial_aggregates(conn, where='1 = 1', params=()):
+    valor = "CASE WHEN Tipo = 'Saídas' THEN ABS(Valor) ELSE Valor END"  # Saídas positivas
+    saidas = f"{where} AND Tipo = 'Saídas'"
+    kpis = conn.execute(f"""
+        SELECT COALESCE(SUM(Valor), 0), COALESCE(SUM(CASE WHEN Tipo = 'Entradas' THEN Valor END), 0),
+               COALESCE(SUM(CASE WHEN Tipo = 'Saídas' THEN Valor END), 0),
+               COALESCE(SUM(CASE WHEN Tipo = 'Saídas' THEN ABS(Valor) END), 0),
+               COUNT(CASE WHEN Tipo = 'Saídas' THEN Valor END), COUNT(CASE WHEN Tipo = 'Saídas' THEN 1 END)
+        FROM financeiro WHERE {where}""", params).fetchone()
+    mensal_tipo = pd.read_sql_query(f"""
+        SELECT substr(Data, 1, 7) AS mes, Tipo, COALESCE(SUM({valor}), 0) AS Valor FROM financeiro
+        WHERE {where} AND Data IS NOT NULL AND Tipo IS NOT NULL GROUP BY mes, Tipo ORDER BY mes, Tipo""", conn, params=list(params))
+    mensal_tipo['Data'] = pd.to_datetime(mensal_tipo.pop('mes') + '-01') + pd.offsets.MonthEnd(0)
+    monthly = "SELECT substr(Data, 1, 7) AS mes, COALESCE(SUM({1}), 0) AS total FROM financeiro WHERE {0} AND Data IS NOT NULL GROUP BY mes ORDER BY mes"
+    despesas = f"SELECT {{0}}, COALESCE(SUM(ABS(Valor)), 0) AS Valor FROM financeiro WHERE {saidas} AND {{0}} IS NOT NULL GROUP BY {{0}} ORDER BY {{0}}"
+    return {
+        'kpis': {
+            'total_valor': kpis[0],
+            'total_entradas': kpis[1],
+            'total_saidas': kpis[2],
+            'despesas_total': kpis[3],
+            'despesas_validas': kpis[4],
+            'despesas_transacoes': kpis[5],
+        },
+        'mensal_tipo': mensal_tipo.set_index(['Data', 'Tipo'])['Valor'],
+        'mensal_saldo': _sql_monthly(pd.read_sql_query(monthly.format(where, 'Valor'), conn, params=list(params)), 'Valor'),
+        'categoria_tipo': _sql_series(conn, f"""
+            SELECT Tipo, Categoria, COALESCE(SUM({valor}), 0) AS Valor FROM financeiro
+            WHERE {where} AND Tipo IS NOT NULL AND Categoria IS NOT NULL GROUP BY Tipo, Categoria ORDER BY Tipo, Categoria""",
+            params, ['Tipo', 'Categoria'], 'Valor'),
+        'saidas_conta': _sql_series(conn, despesas.format('Conta'), params, ['Conta'], 'Valor'),
+        'saidas_mensal': _sql_monthly(pd.read_sql_query(monthly.format(saidas, 'ABS(Valor)'), conn, params=list(params)), 'Valor'),
+        'saidas_categoria': _sql_series(conn, despesas.format('Categoria'), params, ['Categoria'], 'Valor'),
+        'saidas_categoria_contagem': _sql_series(conn, f"""
+            SELECT Categoria, COUNT(*) AS count FROM financeiro WHERE {saidas} AND Categoria IS NOT NULL
+            GROUP BY Categoria ORDER BY count DESC, Categoria""", params, ['Categoria'], 'count'),
+        'saidas_diario': _sql_series(conn, despesas.format('Data'), params, ['Data'], 'Valor'),
+    }
+
+# Chave de cada dimensão das métricas de logística em SQL (ver logistics_dimensions)
+LOGISTICS_SQL_DIMENSIONS = {
+    'modal': 'Tipo',
+    'operador': 'CAST("ID Operador Logístico" AS TEXT)',
+    'origem': "CASE WHEN instr(Origem, '-') > 0 THEN substr(Origem, 1, instr(Origem, '-') - 1) ELSE Origem END",
+    'excecao': '"Cód. Exceção"',
+}
+
+# Agregados de logística calculados no banco (mesmos cubos de build_logistics_aggregates)
+def sql_logistics_aggregates(conn, where='1 = 1', params=()):
+    no_prazo = 'CASE WHEN "Prazo Realizado" <= "Prazo Contratado" THEN 1 ELSE 0 END'
+    lead_time = 'CAST(julianday("Data da Entrega") - julianday("Data da Coleta") AS INTEGER)'
+    atraso = 'MAX("Prazo Realizado" - "Prazo Contratado", 0)'
+    kpis = conn.execute(f'SELECT COUNT(*), COALESCE(SUM("Peso (kg)"), 0) FROM logistica WHERE {where}', params).fetchone()
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(logistica)')}
+    tipo_servico = None
+    if 'Tipo de serviço' in columns:
+        tipo_servico = _sql_series(conn, f"""
+            SELECT "Tipo de serviço", COUNT(*) AS count FROM logistica WHERE {where} AND "Tipo de serviço" IS NOT NULL
+            GROUP BY "Tipo de serviço" ORDER BY count DESC, "Tipo de serviço"
+            """, params, ['Tipo de serviço'], 'count')
+    else:
+        logger.warning(f"Coluna 'Tipo de serviço' não encontrada na tabela logistica. Colunas disponíveis: {sorted(columns)}")
+    otd_tipo = pd.read_sql_query(f"""
+        SELECT Tipo, SUM({no_prazo}) AS no_prazo, COUNT(*) AS embarques FROM logistica
+        WHERE {where} AND Tipo IS NOT NULL GROUP BY Tipo ORDER BY Tipo""", conn, params=list(params)).set_index('Tipo')
+    cubos, histogramas = [], []
+    for chave in LOGISTICS_SQL_DIMENSIONS.values():
+        cubos.append(pd.read_sql_query(f"""
+            SELECT {chave} AS valor, COUNT(*) AS embarques, SUM({no_prazo}) AS no_prazo,
+                   COALESCE(SUM({lead_time}), 0) AS lead_time_soma, COUNT({lead_time}) AS lead_time_contagem,
+                   COALESCE(SUM({atraso}), 0) AS atraso_soma, SUM(CASE WHEN {atraso} > 0 THEN 1 ELSE 0 END) AS atrasados
+            FROM logistica WHERE {where} AND {chave} IS NOT NULL GROUP BY valor ORDER BY valor""",
+            conn, params=list(params)).set_index('valor'))
+        histogramas.append(_sql_series(conn, f"""
+            SELECT {chave} AS valor, {lead_time} AS dias, COUNT(*) AS embarques FROM logistica
+            WHERE {where} AND {chave} IS NOT NULL AND {lead_time} IS NOT NULL GROUP BY valor, dias ORDER BY valor, dias""",
+            params, ['valor', 'dias'], 'embarques'))
+    return {
+        'kpis': {
+            'total_envios': kpis[0],
+            'peso_total': kpis[1],
+        },
+        'tipo_servico': tipo_servico,
+        'otd_tipo': otd_tipo,
+        'metricas_base': pd.concat(cubos, keys=list(LOGISTICS_SQL_DIMENSIONS), names=['dimensao']),
+        'lead_time_dias': pd.concat(histogramas, keys=list(LOGISTICS_SQL_DIMENSIONS), names=['dimensao']),
+    }
+
+# Agregados de vendas calculados no banco (mesmos cubos de build_sales_aggregates)
+def sql_sales_aggregates(conn, where='1 = 1', params=()):
+    kpis = conn.execute(f'SELECT COALESCE(SUM(Total), 0), COALESCE(SUM(Quantidade), 0) FROM vendas WHERE {where}', params).fetchone()
+    return {
+        'kpis': {
+            'total_vendas': kpis[0],
+            'total_quantidade': kpis[1],
+        },
+        'produto': _sql_series(conn, f"""
+            SELECT Produto, COALESCE(SUM(Total), 0) AS Total FROM vendas WHERE {where} AND Produto IS NOT NULL
+            GROUP BY Produto ORDER BY Produto""", params, ['Produto'], 'Total'),
+        'mensal_quantidade': _sql_monthly(pd.read_sql_query(f"""
+            SELECT substr(Data, 1, 7) AS mes, COALESCE(SUM(Quantidade), 0) AS total FROM vendas
+            WHERE {where} AND Data IS NOT NULL GROUP BY mes ORDER BY mes""", conn, params=list(params)), 'Quantidade'),
+    }
+
+# Agregados de despesas Gestor calculados no banco (mesmos cubos de build_personal_expenses_aggregates)
+def sql_personal_expenses_aggregates(conn, where='1 = 1', params=()):
+    kpis = conn.execute(f'SELECT COALESCE(SUM(Valor), 0), COUNT(Valor), COUNT(*) FROM despesas_pessoais WHERE {where}', params).fetchone()
+    grouped = f"SELECT {{0}}, COALESCE(SUM(Valor), 0) AS Valor FROM despesas_pessoais WHERE {where} GROUP BY {{0}} ORDER BY {{0}}"
+    return {
+        'kpis': {
+            'total': kpis[0],
+            'validas': kpis[1],
+            'transacoes': kpis[2],
+        },
+        'categoria': _sql_series(conn, grouped.format('Categoria'), params, ['Categoria'], 'Valor'),
+        'categoria_contagem': _sql_series(conn, f"""
+            SELECT Categoria, COUNT(*) AS count FROM despesas_pessoais WHERE {where}
+            GROUP BY Categoria ORDER BY count DESC, Categoria""", params, ['Categoria'], 'count'),
+        'mensal': _sql_monthly(pd.read_sql_query(f"""
+            SELECT substr(Data, 1, 7) AS mes, COALESCE(SUM(Valor), 0) AS total FROM despesas_pessoais
+            WHERE {where} GROUP BY mes ORDER BY mes""", conn, params=list(params)), 'Valor'),
+        'diario': _sql_series(conn, grouped.format('Data'), params, ['Data'], 'Valor'),
+        'diario_categoria': _sql_series(conn, grouped.format('Data, Categoria'), params, ['Data', 'Categoria'], 'Valor'),
+    }
+
+# --- Dimensões (Cadastros) ---
+# Os cadastros pequenos (setores, operadores logísticos, países, exceções e
+# produtos) são conjuntos de dados registrados como os demais e lidos uma vez.
+# Para cada um é montado, por versão, um índice da chave: associar uma coluna
+# de um fato ao cadastro é só converter chaves em códigos inteiros (posição no
+# cadastro, -1 se ausente) e indexar a coluna desejada por esses códigos, sem
+# merge. Colunas categóricas são convertidas só nas categorias. Os fatos
+# recebem as colunas associadas logo após a carga (inclusive do snapshot) e as
+# refazem quando um cadastro muda.
+
+# Cadastro, coluna-chave e coluna de valor padrão de cada dimensão
+DIMENSIONS = {
+    'setor': ('setores', 'Centro de Custo', 'Setor'),
+    'operador': ('operadores', 'ID Carrier', 'Operador Logístico'),
+    'pais': ('paises', 'ID País Origem', 'País'),
+    'excecao': ('excecoes', 'Cód Exceção', 'Descrição Desvio'),
+    'produto': ('produtos', 'Produto', 'URL Imagem'),
+}
+
+# Colunas associadas a cada fato: nova coluna -> (dimensão, coluna-chave do fato, transformação da chave)
+FINANCIAL_DIMENSIONS = {
+    'Setor': ('setor', 'Conta', None),
+}
+LOGISTICS_DIMENSIONS = {
+    'Operador Logístico': ('operador', 'ID Operador Logístico', None),
+    'País de Origem': ('pais', 'Origem', origin_country_code),
+    'Descrição Exceção': ('excecao', 'Cód. Exceção', None),
+}
+
+Dimension = namedtuple('Dimension', ['table', 'keys'])
+
+_dimension_cache = {}  # nome -> (DataFrame do cadastro, Dimension)
+
+# Cadastro de uma dimensão com o índice da chave (sem chaves repetidas)
+def get_dimension(name):
+    dataset, key_column, _ = DIMENSIONS[name]
+    table = get_dataset(dataset)
+    cached = _dimension_cache.get(name)
+    if cached is not None and cached[0] is table:
+        return cached[1]
+    if key_column in table.columns:
+        unique_table = table.drop_duplicates(key_column).reset_index(drop=True)
+    else:
+        unique_table = pd.DataFrame(columns=[key_column])
+    dimension = Dimension(unique_table, pd.Index(unique_table[key_column]))
+    _dimension_cache[name] = (table, dimension)
+    return dimension
+
+# Códigos inteiros (posição no cadastro, -1 se ausente) de uma série de chaves
+def dimension_codes(name, keys):
+    dimension = get_dimension(name)
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        category_codes = dimension.keys.get_indexer(keys.cat.categories)
+        fact_codes = keys.cat.codes.to_numpy()
+        # Só os códigos válidos indexam as categorias (sem categorias, todas as chaves são nulas)
+        codes = np.full(len(fact_codes), -1, dtype=np.intp)
+        mask = fact_codes >= 0
+        codes[mask] = category_codes[fact_codes[mask]]
+        return codes
+    return dimension.keys.get_indexer(keys)
+
+# Valores de uma coluna do cadastro para cada chave, como categórico (nulo se ausente)
+def dimension_values(name, keys, column=None):
+    keys = pd.Series(keys)
+    column = column or DIMENSIONS[name][2]
+    table = get_dimension(name).table
+    values = table[column] if column in table.columns else pd.Series([], dtype=object)
+    categories = pd.Index(values.dropna().unique()).sort_values()
+    if len(values):
+        value_codes = categories.get_indexer(values)
+        codes = dimension_codes(name, keys)
+        codes = np.where(codes >= 0, value_codes[codes], -1)
+    else:
+        codes = np.full(len(keys), -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=keys.index, name=column)
+
+# Acrescenta a um fato as colunas associadas aos cadastros (novo DataFrame)
+def enrich_with_dimensions(df, dimensions):
+    if df.empty or not dimensions:
+        return df
+    columns = {}
+    for column, (dimension, key_column, transform) in dimensions.items():
+        if key_column in df.columns:
+            keys = df[key_column] if transform is None else df[key_column].map(transform)
+            columns[column] = dimension_values(dimension, keys).array
+    return df.assign(**columns)
+
+# --- Registro de Dados ---
+# Cada conjunto de dados é publicado como uma tupla imutável (df, versão).
+# Recargas constroem o novo DataFrame por completo e só então substituem a
+# referência no dicionário, de modo que requisições em andamento continuam
+# usando o DataFrame antigo e nunca veem um DataFrame pela metade.
+
+# Intervalo (s) entre verificações de alterações em csv/; 0 desativa
+CSV_WATCH_INTERVAL = float(os.environ.get('CSV_WATCH_INTERVAL', '5'))
+
+# Carga sob demanda: cada conjunto é lido no primeiro acesso (pela primeira
+# página que depende dele), e não na importação do módulo. DATA_WARMUP carrega
+# os demais em segundo plano depois que o processo começa a atender requisições.
+DATA_LAZY_LOAD = os.environ.get('DATA_LAZY_LOAD', '1') == '1'
+DATA_WARMUP = os.environ.get('DATA_WARMUP', '1') == '1'
+
+# Snapshots colunares (.feather) dos DataFrames já limpos, gravados ao lado
+# de cada CSV; exigem pyarrow. Incrementar SNAPSHOT_SCHEMA ao mudar a limpeza.
+CSV_SNAPSHOTS = os.environ.get('CSV_SNAPSHOTS', '1') == '1' and feather is not None
+SNAPSHOT_SCHEMA = 2
+
+Dataset = namedtuple('Dataset', ['df', 'version', 'aggregates', 'cursor'])
+DatasetSpec = namedtuple('DatasetSpec', ['file_path', 'loader', 'aggregator', 'cleaner', 'read_options', 'incremental', 'dtypes',
+                                         'dimensions', 'sql_aggregator', 'partition_column'])
+
+_dataset_loaders = {}  # nome -> DatasetSpec
+_datasets = {}  # nome -> Dataset publicado
+_pending_versions = {}  # nome -> versão vista na verificação anterior
+_reload_lock = threading.Lock()
+_load_locks = {}  # nome -> lock da primeira carga
+_watcher_pid = None
+_warmup_pid = None
+
+# Versão de um arquivo: mtime e tamanho (None se não existir)
+def file_version(file_path):
+    try:
+        stat = os.stat(file_path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+# Caminho do snapshot colunar de um CSV (csv/relatorio.csv -> csv/relatorio.feather)
+def snapshot_path(file_path):
+    return os.path.splitext(file_path)[0] + '.feather'
+
+# Chave gravada no snapshot para invalidá-lo quando o CSV mudar
+def _snapshot_key(version):
+    return f"{SNAPSHOT_SCHEMA}:{version[0]}:{version[1]}".encode()
+
+# Lê o snapshot mapeado em memória, se existir e corresponder à versão do CSV
+def read_snapshot(file_path, version):
+    path = snapshot_path(file_path)
+    if version is None or not os.path.exists(path):
+        return None
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except (OSError, pa.ArrowInvalid) as e:
+        logger.warning(f"Snapshot {path} ilegível, ignorando: {str(e)}")
+        return None
+    if (table.schema.metadata or {}).get(b'source_version') != _snapshot_key(version):
+        return None
+    logger.info(f"Dados carregados do snapshot {path} com {table.num_rows} linhas")
+    # split_blocks evita consolidar colunas: numéricos e datas sem nulos viram
+    # visões somente leitura do arquivo mapeado, compartilhado entre os workers
+    # pelo cache de páginas do sistema operacional
+    return table.to_pandas(split_blocks=True)
+
+# Verifica, só pelo esquema, se o snapshot corresponde à versão do CSV
+def snapshot_is_current(file_path, version):
+    try:
+        with pa.memory_map(snapshot_path(file_path)) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return metadata.get(b'source_version') == _snapshot_key(version)
+
+# Grava o DataFrame limpo como snapshot sem compressão (permite memory-map)
+def write_snapshot(file_path, version, df):
+    path = snapshot_path(file_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'source_version'] = _snapshot_key(version)
+        feather.write_feather(table.replace_schema_metadata(metadata), tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)  # Outros processos nunca veem o arquivo incompleto
+        logger.info(f"Snapshot gravado em {path}")
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o snapshot {path}: {str(e)}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# Carrega o DataFrame do snapshot ou do CSV (gravando o snapshot). CSVs
+# maiores que CSV_PARALLEL_MIN_MB são lidos em faixas paralelas e os maiores
+# que CSV_STREAM_MIN_MB, em blocos, já retornando os agregados. preloaded traz
+# o DataFrame e os agregados já lidos pela ingestão paralela (ver parallel_load).
+# Com as partições mensais atuais, nenhuma linha é lida: só os agregados.
+def load_dataset(spec, version, preloaded=None):
+    if preloaded is None and use_partitions(spec):
+        aggregates = read_partition_aggregates(spec, version)
+        if aggregates is not None:
+            return pd.DataFrame(), aggregates
+    df = read_snapshot(spec.file_path, version) if CSV_SNAPSHOTS and not use_partitions(spec) else None
+    if df is not None:
+        return df, None
+    aggregates = None
+    if preloaded is not None:
+        df, aggregates = preloaded
+    elif use_parallel_read(spec, version):
+        try:
+            with ingestion_pool() as pool:
+                df, aggregates = combine_ingestion(submit_ingestion(pool, spec, version))
+        except Exception as e:
+            logger.error(f"Erro ao carregar {spec.file_path}: {str(e)}")
+            df, aggregates = pd.DataFrame(), None
+    elif spec.cleaner is not None and version is not None and version[1] >= CSV_STREAM_MIN_MB * 2**20:
+        try:
+            df, aggregates = stream_csv(spec.file_path, spec.cleaner, spec.read_options, spec.aggregator, spec.dtypes)
+        except Exception as e:
+            logger.error(f"Erro ao carregar {spec.file_path}: {str(e)}")
+            df, aggregates = pd.DataFrame(), None
+    else:
+        df = spec.loader(spec.file_path)
+    if CSV_SNAPSHOTS and not df.empty and version is not None and not use_partitions(spec):
+        write_snapshot(spec.file_path, version, df)
+        # Publica a versão mapeada em memória em vez da cópia privada
+        snapshot = read_snapshot(spec.file_path, version)
+        if snapshot is not None:
+            df = snapshot
+    return df, aggregates
+
+# Registra um conjunto de dados (a carga fica para ensure_dataset ou, com
+# DATA_LAZY_LOAD=0, para a importação, depois de todos os registros). cleaner e read_options
+# permitem a leitura em blocos; incremental ativa a leitura apenas das linhas
+# acrescentadas (ver read_csv_tail); dtypes é o esquema compacto (ver compact_dtypes)
+# e dimensions, as colunas associadas aos cadastros (ver enrich_with_dimensions);
+# sql_aggregator calcula os mesmos agregados no banco analítico (DATA_BACKEND=sqlite)
+# e partition_column é a coluna de data das partições mensais (DATA_PARTITIONS=1).
+def register_dataset(name, file_path, loader, aggregator=None, cleaner=None, read_options=None, incremental=False,
+                     dtypes=None, dimensions=None, sql_aggregator=None, partition_column=None):
+    _dataset_loaders[name] = DatasetSpec(file_path, loader, aggregator, cleaner, read_options, incremental, dtypes, dimensions,
+                                         sql_aggregator, partition_column)
+    _load_locks[name] = threading.Lock()
+
+# Garante que o conjunto foi carregado, fazendo a primeira carga se preciso.
+# Requisições simultâneas pelo mesmo conjunto esperam uma única leitura;
+# conjuntos diferentes carregam em paralelo.
+def ensure_dataset(name):
+    dataset = _datasets.get(name)
+    if dataset is not None:
+        return dataset
+    with _load_locks[name]:
+        dataset = _datasets.get(name)
+        if dataset is None:
+            start = time.perf_counter()
+            with stage('carga'):
+                dataset = reload_dataset(name)
+            logger.info(f"'{name}' carregado sob demanda em {time.perf_counter() - start:.2f}s")
+        return dataset
+
+# Lê no pool de ingestão, ao mesmo tempo, os conjuntos ainda não carregados
+# cujo CSV precisa ser lido (sem snapshot atual) e os publica; os demais, ou
+# todos se o volume for pequeno, seguem pela carga normal
+def parallel_load(names):
+    if DATA_LOAD_WORKERS <= 1:
+        return
+    plan = {}
+    for name in names:
+        spec = _dataset_loaders[name]
+        version = file_version(spec.file_path)
+        if name in _datasets or version is None or uses_database(spec):
+            continue
+        if CSV_SNAPSHOTS and snapshot_is_current(spec.file_path, version):
+            continue
+        if use_partitions(spec) and current_partitions(spec, version) is not None:
+            continue
+        if spec.cleaner is not None and not CSV_STREAM_KEEP_ROWS and version[1] >= CSV_STREAM_MIN_MB * 2**20:
+            continue  # Leitura em blocos só de agregados: memória limitada a um bloco
+        plan[name] = version
+    if sum(version[1] for version in plan.values()) < CSV_PARALLEL_MIN_MB * 2**20:
+        return
+    start = time.perf_counter()
+    with ingestion_pool() as pool:
+        # Maiores primeiro no pool; os menores, que terminam antes, são publicados primeiro
+        futures = {name: submit_ingestion(pool, _dataset_loaders[name], version)
+                   for name, version in sorted(plan.items(), key=lambda item: -item[1][1])}
+        for name in sorted(plan, key=lambda name: plan[name][1]):
+            try:
+                loaded = combine_ingestion(futures[name])
+            except Exception as e:
+                logger.error(f"Erro na ingestão paralela de '{name}': {str(e)}")
+                continue
+            with _load_locks[name]:
+                if name not in _datasets:
+                    reload_dataset(name, preloaded=(plan[name],) + loaded)
+    logger.info(f"Ingestão paralela de {list(plan)} concluída em {time.perf_counter() - start:.2f}s ({DATA_LOAD_WORKERS} processos)")
+
+# Carrega todos os conjuntos registrados ainda não carregados
+def load_all_datasets():
+    try:
+        parallel_load([name for name in _dataset_loaders if name not in _datasets])
+    except Exception as e:
+        logger.error(f"Erro na ingestão paralela: {str(e)}")
+    for name in list(_dataset_loaders):
+        try:
+            ensure_dataset(name)
+        except Exception as e:
+            logger.error(f"Erro ao carregar '{name}': {str(e)}")
+
+# Recarrega um conjunto de dados e publica o novo DataFrame com seus agregados.
+# preloaded = (versão, DataFrame, agregados) já lidos pela ingestão paralela.
+def reload_dataset(name, preloaded=None):
+    spec = _dataset_loaders[name]
+    if uses_database(spec):
+        return reload_dataset_sql(name, spec)
+    version = file_version(spec.file_path) if preloaded is None else preloaded[0]
+    previous = _datasets.get(name)
+    if (spec.incremental and previous is not None and previous.cursor is not None
+            and previous.cursor.rows == len(previous.df)
+            and is_append_only(spec.file_path, previous.cursor, version)):
+        return append_dataset(name, previous, version, spec)
+    df, aggregates = load_dataset(spec, version, None if preloaded is None else preloaded[1:])
+    if aggregates is None:
+        aggregates = spec.aggregator(df) if spec.aggregator is not None and not df.empty else {}
+    if df.empty and not aggregates and previous is not None and (not previous.df.empty or previous.aggregates):
+        # Mantém os dados anteriores se a nova carga falhar (ex.: arquivo em cópia)
+        logger.warning(f"Recarga de '{name}' resultou vazia; mantendo dados anteriores")
+        _datasets[name] = previous._replace(version=version, cursor=None)
+        return _datasets[name]
+    cursor = None
+    if use_partitions(spec) and not df.empty and version is not None:
+        try:
+            write_partitions(name, spec, df, version)
+            df = pd.DataFrame()  # As linhas ficam nas partições (ver filtered_aggregates)
+        except Exception as e:
+            logger.error(f"Erro ao gravar as partições de {spec.file_path}: {str(e)}")
+    if spec.incremental and (not df.empty or aggregates) and file_version(spec.file_path) == version:
+        cursor = file_cursor(spec.file_path, version, len(df))
+    df = enrich_with_dimensions(df, spec.dimensions)
+    _datasets[name] = Dataset(df, version, aggregates, cursor)  # Troca atômica de referência
+    return _datasets[name]
+
+# Indica se os agregados do conjunto vêm do banco analítico
+def uses_database(spec):
+    return DATA_BACKEND == 'sqlite' and spec.sql_aggregator is not None
+
+# Recarga pelo banco analítico: leva a tabela à versão atual do CSV e
+# recalcula os agregados em SQL (o DataFrame publicado fica vazio)
+def reload_dataset_sql(name, spec):
+    version = file_version(spec.file_path)
+    previous = _datasets.get(name)
+    try:
+        sync_table(name, spec, version)
+        aggregates = spec.sql_aggregator(db_connection())
+    except Exception as e:
+        logger.error(f"Erro ao carregar '{name}' do banco {DATA_BACKEND} ({DATA_DB_PATH}): {str(e)}")
+        aggregates = previous.aggregates if previous is not None else {}
+    _datasets[name] = Dataset(pd.DataFrame(), version, aggregates, None)
+    return _datasets[name]
+
+# Acrescenta ao conjunto publicado apenas as linhas novas do CSV, somando os
+# agregados do trecho aos existentes. A versão registrada é a lida antes do
+# trecho: bytes escritos depois disso (ou uma última linha ainda incompleta)
+# mudam a versão do arquivo e são lidos na próxima verificação.
+def append_dataset(name, previous, version, spec):
+    df_tail, offset = read_csv_tail(spec.file_path, previous.cursor.offset, spec.cleaner, spec.read_options, spec.dtypes)
+    if df_tail is None or df_tail.empty:
+        _datasets[name] = previous._replace(version=version)
+        return _datasets[name]
+    # Sem linhas retidas (leitura em blocos só de agregados), apenas os cubos crescem
+    df = previous.df if previous.df.empty else concat_frames([previous.df, enrich_with_dimensions(df_tail, spec.dimensions)])
+    aggregates = previous.aggregates
+    if spec.aggregator is not None:
+        aggregates = merge_aggregates(aggregates, spec.aggregator(df_tail))
+    if use_partitions(spec) and current_partitions(spec, previous.version) is not None:
+        try:
+            write_partitions(name, spec, df_tail, version, append=True)
+        except Exception as e:
+            logger.error(f"Erro ao gravar as partições de {spec.file_path}: {str(e)}")
+    cursor = Cursor(offset, len(df), _fingerprint(spec.file_path, offset))
+    _datasets[name] = Dataset(df, version, aggregates, cursor)
+    logger.info(f"'{name}': {len(df_tail)} linhas acrescentadas de {spec.file_path}")
+    return _datasets[name]
+
+# Refaz as colunas associadas aos cadastros de um fato já publicado
+def enrich_dataset(name):
+    dataset = _datasets[name]
+    _datasets[name] = dataset._replace(df=enrich_with_dimensions(dataset.df, _dataset_loaders[name].dimensions))
+    return _datasets[name]
+
+# Retorna o DataFrame publicado de um conjunto de dados
+def get_dataset(name):
+    return ensure_dataset(name).df
+
+# Retorna os agregados pré-calculados de um conjunto de dados
+def get_aggregates(name):
+    return ensure_dataset(name).aggregates
+
+# Retorna a versão publicada de um conjunto de dados
+def dataset_version(name):
+    return ensure_dataset(name).version
+
+# Recarrega apenas os conjuntos cujo CSV mudou e permaneceu estável
+# entre duas verificações (evita ler um arquivo ainda em cópia)
+def reload_changed_datasets():
+    changed = []
+    with _reload_lock:
+        for name, spec in list(_dataset_loaders.items()):
+            if name not in _datasets:
+                continue  # Ainda não carregado: a primeira carga já lerá a versão atual
+            version = file_version(spec.file_path)
+            if version == _datasets[name].version:
+                _pending_versions.pop(name, None)
+                continue
+            if _pending_versions.get(name) != version:
+                _pending_versions[name] = version
+                continue
+            _pending_versions.pop(name, None)
+            reload_dataset(name)
+            changed.append(name)
+        # Fatos associados a um cadastro recarregado refazem só as colunas associadas
+        for name, spec in list(_dataset_loaders.items()):
+            if name in _datasets and name not in changed and spec.dimensions and any(
+                    DIMENSIONS[dimension][0] in changed for dimension, _, _ in spec.dimensions.values()):
+                enrich_dataset(name)
+                changed.append(name)
+    if changed:
+        logger.info(f"Conjuntos de dados recarregados: {changed}")
+        for page, names in PAGE_DATASETS.items():
+            if set(names) & set(changed):
+                refresh_page(page)
+    return changed
+
+def _watch_csv_dir(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            reload_changed_datasets()
+        except Exception as e:
+            logger.error(f"Erro ao verificar alterações em csv/: {str(e)}")
+
+# Inicia a thread de monitoramento de csv/ (uma por processo)
+def start_csv_watcher(interval=CSV_WATCH_INTERVAL):
+    global _watcher_pid
+    if interval <= 0 or _watcher_pid == os.getpid():
+        return
+    _watcher_pid = os.getpid()
+    threading.Thread(target=_watch_csv_dir, args=(interval,), name='csv-watcher', daemon=True).start()
+    logger.info(f"Monitoramento de csv/ iniciado (intervalo de {interval}s)")
+
+# Inicia o aquecimento em segundo plano dos conjuntos ainda não carregados (uma vez por processo)
+def start_warmup():
+    global _warmup_pid
+    if not DATA_WARMUP or _warmup_pid == os.getpid():
+        return
+    _warmup_pid = os.getpid()
+    threading.Thread(target=load_all_datasets, name='data-warmup', daemon=True).start()
+    logger.info("Aquecimento dos dados iniciado em segundo plano")
+
+# Registrar os dados (carregados no primeiro acesso; ver ensure_dataset)
+register_dataset('financeiro', 'csv/relatorio.csv', load_financial_data, build_financial_aggregates,
+                 clean_financial_data, FINANCIAL_CSV_OPTIONS, incremental=True, dtypes=FINANCIAL_DTYPES,
+                 dimensions=FINANCIAL_DIMENSIONS, sql_aggregator=sql_financial_aggregates, partition_column='Data')
+register_dataset('setores', 'csv/setores.csv', load_sectors_data)
+register_dataset('operadores', 'csv/cadastro_de_operadores_logisticos.csv', load_carriers_data)
+register_dataset('paises', 'csv/bandeiras_paises.csv', load_countries_data)
+register_dataset('excecoes', 'csv/cadastro_de_execoes.csv', load_exceptions_data)
+register_dataset('produtos', 'csv/produtos.csv', load_products_data)
+register_dataset('logistica', 'csv/historico_importacao.csv', load_logistics_data, build_logistics_aggregates,
+                 clean_logistics_data, LOGISTICS_CSV_OPTIONS, incremental=True, dtypes=LOGISTICS_DTYPES,
+                 dimensions=LOGISTICS_DIMENSIONS, sql_aggregator=sql_logistics_aggregates,
+                 partition_column='Data da Coleta')
+register_dataset('vendas', 'csv/pedidos.csv', load_sales_data, build_sales_aggregates,
+                 clean_sales_data, SALES_CSV_OPTIONS, dtypes=SALES_DTYPES, sql_aggregator=sql_sales_aggregates)
 
 # --- 2. Inicialização do Dash ---
-app = Dash(__name__)
+app = Dash(__name__, suppress_callback_exceptions=True)  # Componentes criados por display_page
 server = app.server  # Necessário para o Gunicorn no Docker
 
 # Estilo CSS para o fundo e elementos do dashboard
@@ -184,31 +1708,250 @@ app.index_string = '''
 
 # --- 3. Layouts dos Dashboards ---
 
-def layout_financeiro():
-    if df_financeiro.empty:
-        logger.warning("Dados financeiros vazios ou não carregados")
-        return html.Div("Erro: Dados financeiros não carregados.")
-    
-    # Certifique-se de que 'Data' é datetime
-    df_financeiro['Data'] = pd.to_datetime(df_financeiro['Data'], errors='coerce')
+# --- Redução de Pontos em Séries Temporais ---
+# Séries longas não são enviadas inteiras ao navegador: o intervalo visível é
+# dividido em baldes de mesma duração e, de cada balde, mantêm-se apenas as
+# linhas de mínimo e máximo (preservando picos). O número de pontos por
+# gráfico é um orçamento fixo do servidor (DOWNSAMPLE_MAX_POINTS), e não a
+# largura real do gráfico, que o servidor não conhece; ao dar zoom,
+# zoom_time_series reconstrói a figura só com o trecho pedido, em resolução maior.
+
+DOWNSAMPLE_MAX_POINTS = int(os.environ.get('DOWNSAMPLE_MAX_POINTS', '1200'))
+
+# Recorta as linhas de df cuja coluna x está no intervalo [start, end]. As
+# séries dos agregados já vêm ordenadas por data: o recorte é feito por busca
+# binária; colunas fora de ordem caem no filtro linha a linha.
+def slice_time_range(df, x, start=None, end=None):
+    if df[x].is_monotonic_increasing:
+        lo = 0 if start is None else df[x].searchsorted(pd.Timestamp(start), side='left')
+        hi = len(df) if end is None else df[x].searchsorted(pd.Timestamp(end), side='right')
+        return df.iloc[lo:hi]
+    if start is not None:
+        df = df[df[x] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df[x] <= pd.Timestamp(end)]
+    return df
+
+# Mantém as linhas de mínimo e máximo de cada coluna y em cada balde de tempo
+def downsample_minmax(df, x, y_columns, max_points=None):
+    max_points = max_points or DOWNSAMPLE_MAX_POINTS
+    if len(df) <= max_points:
+        return df
+    buckets = max(1, max_points // (2 * len(y_columns)))
+    ticks = df[x].astype('int64')
+    span = max(ticks.max() - ticks.min(), 1)
+    bucket = ((ticks - ticks.min()) * buckets // (span + 1)).to_numpy()
+    keep = set()
+    for y in y_columns:
+        grouped = df[y].groupby(bucket)
+        keep.update(grouped.idxmin().dropna())
+        keep.update(grouped.idxmax().dropna())
+    return df.loc[sorted(keep)]
+
+# Fixa o eixo x no intervalo pedido e preserva o estado de zoom entre atualizações
+def apply_time_range(fig, start=None, end=None):
+    if start is not None and end is not None:
+        fig.update_xaxes(range=[start, end])
+    fig.update_layout(uirevision='serie-temporal')
+    return fig
+
+# --- Filtros Interativos ---
+# Financeiro, Logística e Despesas têm filtros de período e por categoria.
+# A mudança de um filtro recalcula, no servidor, os agregados só das linhas
+# selecionadas (o mesmo agregador da carga, aplicado ao subconjunto) e devolve
+# apenas os traços dos gráficos afetados (Patch), sem reconstruir a página.
+# As linhas de cada valor de uma coluna vêm de um índice (valor -> posições)
+# e as de um período, de um índice ordenado por data consultado por busca
+# binária (O(log n + k)); ambos são montados uma vez por versão dos dados.
+# Os DataFrames publicados mantêm a ordem do CSV (a ingestão incremental
+# acrescenta linhas ao final), por isso a ordenação fica no índice.
+
+# Conjunto de dados, coluna de data e campos (rótulo, coluna) de cada página com filtros
+PAGE_FILTERS = {
+    'financeiro': {
+        'dataset': 'financeiro', 'date_column': 'Data',
+        'fields': {'categoria': ('Categoria', 'Categoria'), 'setor': ('Setor', 'Setor')},
+    },
+    'logistica': {
+        'dataset': 'logistica', 'date_column': 'Data da Coleta',
+        'fields': {'tipo-servico': ('Tipo de serviço', 'Tipo de serviço')},
+    },
+    'despesas': {
+        'dataset': 'financeiro', 'date_column': 'Data',
+        'fields': {'categoria': ('Categoria', 'Categoria')},
+    },
+}
+
+_row_indexes = {}  # (nome, coluna) -> (DataFrame indexado, {valor: posições})
+_date_indexes = {}  # (nome, coluna) -> (DataFrame indexado, posições em ordem de data, datas ordenadas)
+
+# Índice das posições das linhas de cada valor de uma coluna, refeito quando
+# o DataFrame publicado muda
+def row_index(name, column):
+    df = get_dataset(name)
+    cached = _row_indexes.get((name, column))
+    if cached is not None and cached[0] is df:
+        return cached[1]
+    index = df.groupby(column, observed=True, sort=False).indices
+    _row_indexes[(name, column)] = (df, index)
+    return index
+
+# Índice ordenado de uma coluna de data: posições das linhas (sem datas
+# nulas) em ordem crescente de data e as datas correspondentes
+def date_index(name, column):
+    df = get_dataset(name)
+    cached = _date_indexes.get((name, column))
+    if cached is not None and cached[0] is df:
+        return cached[1], cached[2]
+    dates = df[column].to_numpy()
+    valid = np.flatnonzero(~pd.isna(dates))
+    order = valid[np.argsort(dates[valid], kind='stable')]
+    _date_indexes[(name, column)] = (df, order, dates[order])
+    return order, dates[order]
+
+# Posições das linhas com data em [start, end), por busca binária no índice ordenado
+def date_range_positions(name, column, start=None, end=None):
+    order, sorted_dates = date_index(name, column)
+    lo = 0 if start is None else np.searchsorted(sorted_dates, np.datetime64(pd.Timestamp(start)), side='left')
+    hi = len(order) if end is None else np.searchsorted(sorted_dates, np.datetime64(pd.Timestamp(end)), side='left')
+    return order[lo:hi]
+
+# Valores de um campo de filtro
+def filter_options(values):
+    return [{'label': value, 'value': value} for value in sorted(values)]
+
+# Condição SQL (e parâmetros) do período [start, end) e dos valores
+# selecionados de uma página. Colunas associadas a um cadastro (ex.: Setor)
+# não estão na tabela: filtram pelas chaves do cadastro com esses valores.
+def sql_filter(page, start=None, end=None, selections=None):
+    config = PAGE_FILTERS[page]
+    dimensions = _dataset_loaders[config['dataset']].dimensions or {}
+    clauses, params = ['1 = 1'], []
+    if start is not None:
+        clauses.append(f"{_q(config['date_column'])} >= ?")
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        clauses.append(f"{_q(config['date_column'])} < ?")
+        params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+    for campo, values in (selections or {}).items():
+        column = config['fields'][campo][1]
+        if column in dimensions:
+            dimension, column, _ = dimensions[column]
+            table = get_dimension(dimension).table
+            _, key_column, value_column = DIMENSIONS[dimension]
+            values = table.loc[table[value_column].isin(values), key_column].tolist()
+        clauses.append(f"{_q(column)} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    return ' AND '.join(clauses), params
+
+# Agregados da página restritos ao período e aos valores selecionados
+@timed_stage('agregacao')
+def filtered_aggregates(page, start=None, end=None, selections=None):
+    config = PAGE_FILTERS[page]
+    name = config['dataset']
+    selections = {campo: values for campo, values in (selections or {}).items() if values}
+    if start is None and end is None and not selections:
+        return get_aggregates(name)
+    end = None if end is None else pd.Timestamp(end) + pd.Timedelta(days=1)  # Data final inclusiva
+    spec = _dataset_loaders[name]
+    if uses_database(spec):
+        ensure_dataset(name)
+        return spec.sql_aggregator(db_connection(), *sql_filter(page, start, end, selections))
+    df = get_dataset(name)
+    if df.empty and use_partitions(spec):
+        manifest = current_partitions(spec, dataset_version(name))
+        if manifest is not None and manifest['meses']:
+            return spec.aggregator(partition_rows(page, manifest, start, end, selections))
+    if df.empty:
+        return get_aggregates(name)  # Só agregados em memória
+    positions = None
+    if start is not None or end is not None:
+        positions = date_range_positions(name, config['date_column'], start, end)
+    for campo, values in selections.items():
+        column = config['fields'][campo][1]
+        index = row_index(name, column)
+        found = np.concatenate([index.get(value, np.array([], dtype=np.intp)) for value in values] or [np.array([], dtype=np.intp)])
+        positions = found if positions is None else np.intersect1d(positions, found, assume_unique=True)
+    # Posições em ordem original: o agregador vê as linhas como na carga completa
+    subset = df if positions is None else df.take(np.sort(positions))
+    return spec.aggregator(subset)
+
+# Datas mínima e máxima e valores de cada campo de filtro de uma página, do
+# DataFrame ou do banco analítico (None se as linhas não estão disponíveis)
+def filter_domain(page):
+    config = PAGE_FILTERS[page]
+    name = config['dataset']
+    spec = _dataset_loaders[name]
+    ensure_dataset(name)
+    if not uses_database(spec):
+        df = get_dataset(name)
+        manifest = current_partitions(spec, dataset_version(name)) if df.empty and use_partitions(spec) else None
+        if manifest is not None and manifest['meses']:
+            return partition_domain(page, manifest)
+        if df.empty:
+            return None
+        dates = df[config['date_column']].dropna()
+        first, last = (dates.min(), dates.max()) if not dates.empty else (None, None)
+        values = {campo: df[column].dropna().unique() for campo, (_, column) in config['fields'].items()}
+        return first, last, values
+    conn = db_connection()
+    try:
+        first, last = conn.execute(f"SELECT MIN({_q(config['date_column'])}), MAX({_q(config['date_column'])}) FROM {_q(name)}").fetchone()
+    except sqlite3.OperationalError:
+        return None  # Tabela ainda não ingerida
+    values = {}
+    for campo, (_, column) in config['fields'].items():
+        dimension, key_column = None, column
+        if column in (spec.dimensions or {}):
+            dimension, key_column, _ = spec.dimensions[column]
+        keys = pd.Series([row[0] for row in conn.execute(f"SELECT DISTINCT {_q(key_column)} FROM {_q(name)} WHERE {_q(key_column)} IS NOT NULL")])
+        values[campo] = (keys if dimension is None else dimension_values(dimension, keys)).dropna().unique()
+    return (None if first is None else pd.Timestamp(first)), (None if last is None else pd.Timestamp(last)), values
+
+# Barra de filtros de uma página (vazia se as linhas não estão disponíveis)
+def filter_bar(page):
+    config = PAGE_FILTERS[page]
+    domain = filter_domain(page)
+    if domain is None:
+        return html.Div()
+    first, last, values = domain
+    controls = [dcc.DatePickerRange(
+        id={'type': 'filtro-periodo', 'page': page},
+        min_date_allowed=first.date() if first is not None else None,
+        max_date_allowed=last.date() if last is not None else None,
+        display_format='DD/MM/YYYY', start_date_placeholder_text='Início',
+        end_date_placeholder_text='Fim', clearable=True
+    )]
+    for campo, (label, column) in config['fields'].items():
+        controls.append(dcc.Dropdown(
+            id={'type': 'filtro', 'page': page, 'campo': campo},
+            options=filter_options(values[campo]), multi=True,
+            placeholder=label, style={'minWidth': '240px'}
+        ))
+    return html.Div(className="card-container", children=controls)
+
+# Atualização parcial de um gráfico: substitui só os traços da figura
+def figure_patch(fig):
+    patch = Patch()
+    patch['data'] = fig.to_plotly_json()['data']
+    return patch
+
+
+# Gráfico de Linha: Entradas e Saídas Mensais
+@timed_stage('figuras')
+def build_fig_entradas_saidas(agregados, start=None, end=None):
+    # Saídas já em valores positivos
+    df_entradas_saidas_monthly = agregados['mensal_tipo'].unstack(fill_value=0).reset_index()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Dados relatorios para gráfico: \n{df_entradas_saidas_monthly}")
 
-    # Calcular métricas financeiras
-    total_entradas = df_financeiro[df_financeiro['Tipo'] == 'Entradas']['Valor'].sum()
-    total_saidas = abs(df_financeiro[df_financeiro['Tipo'] == 'Saídas']['Valor'].sum())  # Use abs para exibir positivo
-    saldo_total = total_entradas + df_financeiro[df_financeiro['Tipo'] == 'Saídas']['Valor'].sum()
-
-    # Gráfico de Linha: Entradas e Saídas Mensais
-    # Transformar Saídas em valores positivos para visualização
-    df_plot = df_financeiro.copy()
-    df_plot['Valor'] = df_plot.apply(lambda x: abs(x['Valor']) if x['Tipo'] == 'Saídas' else x['Valor'], axis=1)
-    df_entradas_saidas_monthly = df_plot.groupby([pd.Grouper(key='Data', freq='ME'), 'Tipo'])['Valor'].sum().unstack(fill_value=0).reset_index()
-    logger.info(f"Dados relatorios para gráfico: \n{df_entradas_saidas_monthly}")
-    
     if 'Entradas' not in df_entradas_saidas_monthly.columns:
         df_entradas_saidas_monthly['Entradas'] = 0
     if 'Saídas' not in df_entradas_saidas_monthly.columns:
         df_entradas_saidas_monthly['Saídas'] = 0
-    
+    df_entradas_saidas_monthly = downsample_minmax(
+        slice_time_range(df_entradas_saidas_monthly, 'Data', start, end), 'Data', ['Entradas', 'Saídas'])
+
     fig_entradas_saidas = px.line(
         df_entradas_saidas_monthly,
         x='Data',
@@ -227,10 +1970,16 @@ def layout_financeiro():
     fig_entradas_saidas.update_yaxes(rangemode='tozero')
     fig_entradas_saidas.update_traces(hovertemplate='Mês: %{x|%b %Y}<br>Tipo: %{variable}<br>Valor: R$ %{y:,.2f}')
     fig_entradas_saidas.update_layout(hovermode="x unified")
+    return apply_time_range(fig_entradas_saidas, start, end)
 
-    # Gráfico de Saldo Acumulado
-    df_financeiro_monthly_saldo = df_financeiro.set_index('Data').resample('ME')['Valor'].sum().reset_index()
+# Gráfico de Linha: Saldo Acumulado ao Longo do Tempo
+@timed_stage('figuras')
+def build_fig_saldo_tempo(agregados, start=None, end=None):
+    # Acumulado sobre a série completa, antes do recorte
+    df_financeiro_monthly_saldo = agregados['mensal_saldo'].reset_index()
     df_financeiro_monthly_saldo['Saldo Acumulado'] = df_financeiro_monthly_saldo['Valor'].cumsum()
+    df_financeiro_monthly_saldo = downsample_minmax(
+        slice_time_range(df_financeiro_monthly_saldo, 'Data', start, end), 'Data', ['Saldo Acumulado'])
     fig_saldo_tempo = px.line(df_financeiro_monthly_saldo, x='Data', y='Saldo Acumulado',
                               title='Saldo Acumulado ao Longo do Tempo',
                               labels={'Data': 'Data', 'Saldo Acumulado': 'Saldo (R$)'})
@@ -239,9 +1988,12 @@ def layout_financeiro():
         margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Data", yaxis_title="Saldo (R$)",
         xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
     )
+    return apply_time_range(fig_saldo_tempo, start, end)
 
-    # Gráfico de Barras: Entradas e Saídas por Categoria
-    df_categorias = df_plot.groupby(['Tipo', 'Categoria'])['Valor'].sum().reset_index()
+# Gráfico de Barras: Entradas e Saídas por Categoria
+@timed_stage('figuras')
+def build_fig_categorias(agregados):
+    df_categorias = agregados['categoria_tipo'].reset_index()
     fig_categorias = px.bar(df_categorias, x='Categoria', y='Valor', color='Tipo',
                             title='Entradas e Saídas por Categoria',
                             barmode='group',
@@ -251,11 +2003,14 @@ def layout_financeiro():
         margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Categoria", yaxis_title="Valor (R$)",
         xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
     )
+    return fig_categorias
 
-    # Gráfico de Rosca: Despesas por Setor
-    df_financeiro_com_setor = pd.merge(df_financeiro, df_setor, left_on='Conta', right_on='Centro de Custo', how='left')
-    df_despesas_por_setor = df_financeiro_com_setor[df_financeiro_com_setor['Tipo'] == 'Saídas'].copy()
-    df_despesas_por_setor_relatorio = df_despesas_por_setor.groupby('Setor')['Valor'].apply(lambda x: abs(x).sum()).reset_index()
+# Gráfico de Rosca: Despesas por Setor (centros de custo associados ao setor)
+@timed_stage('figuras')
+def build_fig_despesas_setor(agregados):
+    saidas_conta = agregados['saidas_conta']
+    setor = dimension_values('setor', saidas_conta.index.to_series(), 'Setor')
+    df_despesas_por_setor_relatorio = plain_index(saidas_conta.groupby(setor.to_numpy(), observed=True).sum().rename_axis('Setor')).reset_index()
     fig_donut_setor = px.pie(
         df_despesas_por_setor_relatorio, values='Valor', names='Setor',
         title='Despesas por Setor', hole=0.5, template="plotly_white",
@@ -266,9 +2021,31 @@ def layout_financeiro():
         margin=dict(l=40, r=40, t=60, b=40), legend_title_text='Setor', title_x=0.5
     )
     fig_donut_setor.update_traces(hovertemplate='Setor: %{label}<br>Despesa: R$ %{value:,.2f}<br>Porcentagem: %{percent}')
+    return fig_donut_setor
+
+def layout_financeiro():
+    agregados = get_aggregates('financeiro')
+    if not agregados:
+        logger.warning("Dados financeiros vazios ou não carregados")
+        return html.Div("Erro: Dados financeiros não carregados.")
+
+    # Calcular métricas financeiras
+    kpis = agregados['kpis']
+    total_entradas = kpis['total_entradas']
+    total_saidas = abs(kpis['total_saidas'])  # Use abs para exibir positivo
+    saldo_total = total_entradas + kpis['total_saidas']
+
+    # Gráficos de Linha: Entradas e Saídas Mensais e Saldo Acumulado
+    fig_entradas_saidas = build_fig_entradas_saidas(agregados)
+    fig_saldo_tempo = build_fig_saldo_tempo(agregados)
+
+    # Gráficos de Barras (Entradas e Saídas por Categoria) e de Rosca (Despesas por Setor)
+    fig_categorias = build_fig_categorias(agregados)
+    fig_donut_setor = build_fig_despesas_setor(agregados)
 
     return html.Div([
         html.H2("Dashboard Financeiro", className="text-2xl font-bold mb-4 text-gray-800"),
+        filter_bar('financeiro'),
         html.Div(className="card-container", children=[
             html.Div(className="card", children=[
                 html.H3("Total de Entradas"),
@@ -284,32 +2061,22 @@ def layout_financeiro():
             ]),
         ]),
         html.Div(className="grid grid-cols-1 md:grid-cols-2 gap-6", children=[
-            dcc.Graph(figure=fig_entradas_saidas, className="dashboard-section"),
-            dcc.Graph(figure=fig_saldo_tempo, className="dashboard-section"),
-            dcc.Graph(figure=fig_categorias, className="dashboard-section"),
-            dcc.Graph(figure=fig_donut_setor, className="dashboard-section")
+            dcc.Graph(id={'type': 'serie-temporal', 'id': 'entradas-saidas'}, figure=fig_entradas_saidas, className="dashboard-section"),
+            dcc.Graph(id={'type': 'serie-temporal', 'id': 'saldo-tempo'}, figure=fig_saldo_tempo, className="dashboard-section"),
+            dcc.Graph(id='grafico-categorias', figure=fig_categorias, className="dashboard-section"),
+            dcc.Graph(id='grafico-despesas-setor', figure=fig_donut_setor, className="dashboard-section")
         ])
     ])
 
-# Layout do Dashboard de Logística
-def layout_logistica():
-    if df_logistica.empty:
-        logger.warning("Dados de logística vazios ou não carregados")
-        return html.Div("Erro: Dados de logística não carregados.")
-    
-    # Métricas de Logística
-    total_envios = len(df_logistica)
-    custo_total = df_logistica['Peso (kg)'].sum()  # Usando peso como proxy para custo
-    tipo_col = 'Tipo de serviço'  # Nome esperado
-    if tipo_col not in df_logistica.columns:
-        logger.warning(f"Coluna '{tipo_col}' não encontrada em df_logistica. Colunas disponíveis: {list(df_logistica.columns)}")
-        tipo_col = None
+# Gráfico de Pizza: Tipos de Serviço
+@timed_stage('figuras')
+def build_fig_tipo_servico(agregados):
+    if agregados['tipo_servico'] is None:
         status_counts = pd.DataFrame({'Serviço': ['N/A'], 'Contagem': [0]})
     else:
-        status_counts = df_logistica[tipo_col].value_counts().reset_index()
+        status_counts = agregados['tipo_servico'].reset_index()
         status_counts.columns = ['Serviço', 'Contagem']
 
-    # Gráfico de Pizza: Tipos de Serviço
     fig_status = px.pie(status_counts, values='Contagem', names='Serviço',
                         title='Distribuição por Tipo de Serviço',
                         color_discrete_sequence=px.colors.qualitative.Pastel)
@@ -317,11 +2084,13 @@ def layout_logistica():
         plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
         margin=dict(l=40, r=40, t=60, b=40)
     )
+    return fig_status
 
-    # Indicador OTD (On Time Delivery)
-    df_logistica['OTD'] = df_logistica['Prazo Realizado'] <= df_logistica['Prazo Contratado']
-    otd_por_modal = df_logistica.groupby('Tipo')['OTD'].mean().reset_index()
-    otd_por_modal['OTD'] = otd_por_modal['OTD'] * 100
+# Indicador OTD (On Time Delivery) por modal
+@timed_stage('figuras')
+def build_fig_otd(agregados):
+    otd_por_modal = agregados['otd_tipo'].reset_index()
+    otd_por_modal['OTD'] = otd_por_modal['no_prazo'] / otd_por_modal['embarques'] * 100
     fig_otd = px.bar(otd_por_modal, x='Tipo', y='OTD',
                      title='On Time Delivery (OTD) por Modal',
                      labels={'Tipo': 'Modal', 'OTD': 'OTD (%)'},
@@ -331,9 +2100,80 @@ def layout_logistica():
         margin=dict(l=40, r=40, t=60, b=40), xaxis=dict(showgrid=True, gridcolor='#e0e0e0'),
         yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
     )
+    return fig_otd
+
+# Gráfico de Barras: Lead Time Médio e P90 por Operador Logístico
+@timed_stage('figuras')
+def build_fig_lead_time_operador(metricas):
+    df_operador = metricas['operador']
+    fig_lead_time = px.bar(df_operador, x='Nome', y=['Lead Time Médio (dias)', 'Lead Time P90 (dias)'],
+                           title='Lead Time por Operador Logístico', barmode='group',
+                           labels={'Nome': 'Operador Logístico', 'value': 'Dias', 'variable': 'Métrica'},
+                           color_discrete_sequence=px.colors.qualitative.Set2)
+    fig_lead_time.update_layout(
+        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
+        margin=dict(l=40, r=40, t=60, b=40), xaxis=dict(showgrid=True, gridcolor='#e0e0e0'),
+        yaxis=dict(showgrid=True, gridcolor='#e0e0e0'), legend_title_text='Métrica'
+    )
+    return fig_lead_time
+
+# Gráfico de Barras: OTD e Atraso Médio por País de Origem
+@timed_stage('figuras')
+def build_fig_otd_origem(metricas):
+    df_origem = metricas['origem'].sort_values('Embarques', ascending=False)
+    fig_otd_origem = px.bar(df_origem, x='Nome', y='OTD (%)', color='Atraso Médio (dias)',
+                            title='OTD por País de Origem',
+                            labels={'Nome': 'País de Origem'},
+                            hover_data=['Embarques', 'Lead Time Médio (dias)'],
+                            color_continuous_scale='Reds')
+    fig_otd_origem.update_layout(
+        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
+        margin=dict(l=40, r=40, t=60, b=40), xaxis=dict(showgrid=True, gridcolor='#e0e0e0'),
+        yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
+    )
+    return fig_otd_origem
+
+# Tabela: Embarques, OTD e atraso por código de exceção
+@timed_stage('figuras')
+def build_tabela_excecoes(metricas):
+    colunas = ['Código', 'Nome', 'Responsável', 'Embarques', 'OTD (%)', 'Lead Time Médio (dias)', 'Atraso Médio (dias)']
+    df_excecoes = metricas['excecao']
+    colunas = [col for col in colunas if col in df_excecoes.columns]
+    return html.Table(style={'width': '100%', 'borderCollapse': 'collapse'}, children=[
+        html.Thead(html.Tr([html.Th(col, style={'textAlign': 'left', 'padding': '4px'}) for col in colunas])),
+        html.Tbody([
+            html.Tr([
+                html.Td(f"{row[col]:,.1f}".replace(",", "X").replace(".", ",").replace("X", ".") if isinstance(row[col], float) else row[col],
+                        style={'padding': '4px'})
+                for col in colunas
+            ])
+            for _, row in df_excecoes.iterrows()
+        ])
+    ])
+
+# Layout do Dashboard de Logística
+def layout_logistica():
+    agregados = get_aggregates('logistica')
+    if not agregados:
+        logger.warning("Dados de logística vazios ou não carregados")
+        return html.Div("Erro: Dados de logística não carregados.")
+
+    # Métricas de Logística
+    total_envios = agregados['kpis']['total_envios']
+    custo_total = agregados['kpis']['peso_total']  # Usando peso como proxy para custo
+
+    # Gráficos de Pizza (Tipos de Serviço) e do Indicador OTD por Modal
+    fig_status = build_fig_tipo_servico(agregados)
+    fig_otd = build_fig_otd(agregados)
+
+    # Métricas por operador, país de origem e exceção (calculadas uma vez por carga)
+    metricas = get_logistics_metrics()
+    fig_lead_time = build_fig_lead_time_operador(metricas)
+    fig_otd_origem = build_fig_otd_origem(metricas)
 
     return html.Div([
         html.H2("Dashboard de Logística", className="text-2xl font-bold mb-4 text-gray-800"),
+        filter_bar('logistica'),
         html.Div(className="card-container", children=[
             html.Div(className="card", children=[
                 html.H3("Total de Embarques"),
@@ -345,40 +2185,48 @@ def layout_logistica():
             ]),
         ]),
         html.Div(className="grid grid-cols-1 md:grid-cols-2 gap-6", children=[
-            dcc.Graph(figure=fig_status, className="dashboard-section"),
-            dcc.Graph(figure=fig_otd, className="dashboard-section")
+            dcc.Graph(id='grafico-tipo-servico', figure=fig_status, className="dashboard-section"),
+            dcc.Graph(id='grafico-otd', figure=fig_otd, className="dashboard-section"),
+            dcc.Graph(id='grafico-lead-time-operador', figure=fig_lead_time, className="dashboard-section"),
+            dcc.Graph(id='grafico-otd-origem', figure=fig_otd_origem, className="dashboard-section"),
+            html.Div(className="dashboard-section", children=[
+                html.H3("Exceções por Código", className="text-xl font-semibold mb-2 text-gray-800"),
+                html.Div(id='tabela-excecoes', children=build_tabela_excecoes(metricas))
+            ])
         ])
     ])
 
 def layout_vendas():
-    if df_vendas.empty:
+    agregados = get_aggregates('vendas')
+    if not agregados:
         return html.Div("Erro: Dados de vendas não carregados.")
-    
+
     # Métricas de Vendas
-    total_vendas = df_vendas['Total'].sum()
-    total_produtos_vendidos = df_vendas['Quantidade'].sum()
-    vendas_por_produto = df_vendas.groupby('Produto')['Total'].sum().sort_values(ascending=False).reset_index()
-
-    # Gráfico de Barras: Vendas por Produto
-    fig_vendas_produto = px.bar(vendas_por_produto, x='Produto', y='Total',
-                                title='Vendas Totais por Produto',
-                                color_discrete_sequence=px.colors.qualitative.Set2)
-    fig_vendas_produto.update_layout(
-        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
-        margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Produto", yaxis_title="Total de Venda (R$)",
-        xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
-    )
+    total_vendas = agregados['kpis']['total_vendas']
+    total_produtos_vendidos = agregados['kpis']['total_quantidade']
+    vendas_por_produto = agregados['produto'].sort_values(ascending=False).reset_index()
 
-    # Gráfico de Sazonalidade: Volume por Mês
-    df_vendas_monthly = df_vendas.groupby(pd.Grouper(key='Data', freq='ME'))['Quantidade'].sum().reset_index()
-    fig_sazonalidade = px.line(df_vendas_monthly, x='Data', y='Quantidade',
-                               title='Volume de Produção por Mês (Sazonalidade)',
-                               labels={'Data': 'Mês', 'Quantidade': 'Volume'})
-    fig_sazonalidade.update_layout(
-        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
-        margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Mês", yaxis_title="Volume",
-        xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
-    )
+    with stage('figuras'):
+        # Gráfico de Barras: Vendas por Produto
+        fig_vendas_produto = px.bar(vendas_por_produto, x='Produto', y='Total',
+                                    title='Vendas Totais por Produto',
+                                    color_discrete_sequence=px.colors.qualitative.Set2)
+        fig_vendas_produto.update_layout(
+            plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
+            margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Produto", yaxis_title="Total de Venda (R$)",
+            xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
+        )
+
+        # Gráfico de Sazonalidade: Volume por Mês
+        df_vendas_monthly = agregados['mensal_quantidade'].reset_index()
+        fig_sazonalidade = px.line(df_vendas_monthly, x='Data', y='Quantidade',
+                                   title='Volume de Produção por Mês (Sazonalidade)',
+                                   labels={'Data': 'Mês', 'Quantidade': 'Volume'})
+        fig_sazonalidade.update_layout(
+            plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
+            margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Mês", yaxis_title="Volume",
+            xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
+        )
 
     return html.Div([
         html.H2("Dashboard de Vendas", className="text-2xl font-bold mb-4 text-gray-800"),
@@ -398,22 +2246,30 @@ def layout_vendas():
         ])
     ])
 # --- 5. Layout do Dashboard de Despesas ---
-def layout_despesas():
-    if df_financeiro.empty:
-        logger.warning("Dados financeiros vazios ou não carregados")
-        return html.Div("Erro: Dados financeiros não carregados.")
-    
-    # Filtrar apenas saídas para despesas
-    df_despesas = df_financeiro[df_financeiro['Tipo'] == 'Saídas'].copy()
-    df_despesas['Valor'] = df_despesas['Valor'].apply(abs)  # Transformar em valores positivos para visualização
 
-    # Métricas de Despesas
-    total_despesas = df_despesas['Valor'].sum()
-    media_despesa = df_despesas['Valor'].mean() if len(df_despesas) > 0 else 0
-    num_transacoes = len(df_despesas)
+# Gráfico de Dispersão: Picos de Gasto Diário
+@timed_stage('figuras')
+def build_fig_picos_despesas(agregados, start=None, end=None):
+    df_gasto_diario = agregados['saidas_diario'].reset_index()
+    df_gasto_diario = downsample_minmax(slice_time_range(df_gasto_diario, 'Data', start, end), 'Data', ['Valor'])
+    fig_picos_diario = px.scatter(
+        df_gasto_diario, x='Data', y='Valor',
+        title='Picos de Gasto Diário',
+        labels={'Data': 'Data', 'Valor': 'Gasto Diário (R$)'},
+        color_discrete_sequence=['#e74c3c'],
+        template="plotly_white"
+    )
+    fig_picos_diario.update_layout(
+        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
+        margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Data", yaxis_title="Gasto Diário (R$)",
+        xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
+    )
+    return apply_time_range(fig_picos_diario, start, end)
 
-    # Gráfico de Linha: Despesas Mensais
-    df_despesas_mensal = df_despesas.groupby(pd.Grouper(key='Data', freq='ME'))['Valor'].sum().reset_index()
+# Gráfico de Linha: Despesas Mensais
+@timed_stage('figuras')
+def build_fig_despesas_mensal(agregados):
+    df_despesas_mensal = agregados['saidas_mensal'].reset_index()
     fig_despesas_mensal = px.line(
         df_despesas_mensal, x='Data', y='Valor',
         title='Despesas Mensais',
@@ -428,9 +2284,12 @@ def layout_despesas():
     )
     fig_despesas_mensal.update_yaxes(rangemode='tozero')
     fig_despesas_mensal.update_traces(hovertemplate='Mês: %{x|%b %Y}<br>Valor: R$ %{y:,.2f}')
+    return fig_despesas_mensal
 
-    # Gráfico de Barras Horizontais: Gasto Total por Categoria (Top 5)
-    df_gasto_categoria = df_despesas.groupby('Categoria')['Valor'].sum().reset_index()
+# Gráfico de Barras Horizontais: Gasto Total por Categoria (Top 5)
+@timed_stage('figuras')
+def build_fig_gasto_categoria(agregados):
+    df_gasto_categoria = agregados['saidas_categoria'].reset_index()
     df_gasto_categoria_top5 = df_gasto_categoria.sort_values('Valor', ascending=False).head(5)
     fig_gasto_categoria = px.bar(
         df_gasto_categoria_top5, y='Categoria', x='Valor',
@@ -445,9 +2304,12 @@ def layout_despesas():
         margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Valor (R$)", yaxis_title="Categoria",
         xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
     )
+    return fig_gasto_categoria
 
-    # Gráfico de Barras Verticais: Frequência de Transações por Categoria (Top 5)
-    df_frequencia_categoria = df_despesas['Categoria'].value_counts().reset_index()
+# Gráfico de Barras Verticais: Frequência de Transações por Categoria (Top 5)
+@timed_stage('figuras')
+def build_fig_frequencia_categoria(agregados):
+    df_frequencia_categoria = agregados['saidas_categoria_contagem'].reset_index()
     df_frequencia_categoria.columns = ['Categoria', 'Contagem']
     df_frequencia_categoria_top5 = df_frequencia_categoria.head(5)
     fig_frequencia_categoria = px.bar(
@@ -462,8 +2324,12 @@ def layout_despesas():
         margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Categoria", yaxis_title="Número de Transações",
         xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
     )
+    return fig_frequencia_categoria
 
-    # Gráfico de Rosca: Distribuição de Gastos (Top 5-7 + Outros)
+# Gráfico de Rosca: Distribuição de Gastos (Top 5-7 + Outros)
+@timed_stage('figuras')
+def build_fig_distribuicao_despesas(agregados):
+    df_gasto_categoria = agregados['saidas_categoria'].reset_index()
     df_distribuicao = df_gasto_categoria.sort_values('Valor', ascending=False)
     top_categorias = df_distribuicao.head(6)  # Top 6 categorias
     outros_valor = df_distribuicao[6:]['Valor'].sum()  # Soma das demais
@@ -482,21 +2348,36 @@ def layout_despesas():
         margin=dict(l=40, r=40, t=60, b=40), legend_title_text='Categoria', title_x=0.5
     )
     fig_donut_despesas.update_traces(hovertemplate='Categoria: %{label}<br>Despesa: R$ %{value:,.2f}<br>Porcentagem: %{percent}')
+    return fig_donut_despesas
+
+def layout_despesas():
+    # Agregados das saídas, já em valores positivos para visualização
+    agregados = get_aggregates('financeiro')
+    if not agregados:
+        logger.warning("Dados financeiros vazios ou não carregados")
+        return html.Div("Erro: Dados financeiros não carregados.")
+
+    # Métricas de Despesas
+    total_despesas = agregados['kpis']['despesas_total']
+    validas = agregados['kpis']['despesas_validas']
+    media_despesa = total_despesas / validas if validas > 0 else 0
+    num_transacoes = agregados['kpis']['despesas_transacoes']
+
+    # Séries usadas nos insights
+    df_despesas_mensal = agregados['saidas_mensal'].reset_index()
+    df_gasto_categoria = agregados['saidas_categoria'].reset_index()
+    df_frequencia_categoria = agregados['saidas_categoria_contagem'].reset_index()
+    df_frequencia_categoria.columns = ['Categoria', 'Contagem']
+
+    # Gráficos de Despesas Mensais, por Categoria (Top 5), de Frequência (Top 5) e de Distribuição
+    fig_despesas_mensal = build_fig_despesas_mensal(agregados)
+    fig_gasto_categoria = build_fig_gasto_categoria(agregados)
+    fig_frequencia_categoria = build_fig_frequencia_categoria(agregados)
+    fig_donut_despesas = build_fig_distribuicao_despesas(agregados)
 
     # Gráfico de Dispersão: Picos de Gasto Diário
-    df_gasto_diario = df_despesas.groupby('Data')['Valor'].sum().reset_index()
-    fig_picos_diario = px.scatter(
-        df_gasto_diario, x='Data', y='Valor',
-        title='Picos de Gasto Diário',
-        labels={'Data': 'Data', 'Valor': 'Gasto Diário (R$)'},
-        color_discrete_sequence=['#e74c3c'],
-        template="plotly_white"
-    )
-    fig_picos_diario.update_layout(
-        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
-        margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Data", yaxis_title="Gasto Diário (R$)",
-        xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
-    )
+    df_gasto_diario = agregados['saidas_diario'].reset_index()
+    fig_picos_diario = build_fig_picos_despesas(agregados)
 
     # Insights e Anomalias
     top_categoria = df_gasto_categoria.loc[df_gasto_categoria['Valor'].idxmax()]
@@ -523,6 +2404,7 @@ def layout_despesas():
 
     return html.Div([
         html.H2("Dashboard de Despesas", className="text-2xl font-bold mb-4 text-gray-800"),
+        filter_bar('despesas'),
         html.Div(className="card-container", children=[
             html.Div(className="card", children=[
                 html.H3("Total de Despesas"),
@@ -538,11 +2420,11 @@ def layout_despesas():
             ]),
         ]),
         html.Div(className="grid grid-cols-1 md:grid-cols-2 gap-6", children=[
-            dcc.Graph(figure=fig_despesas_mensal, className="dashboard-section"),
-            dcc.Graph(figure=fig_gasto_categoria, className="dashboard-section"),
-            dcc.Graph(figure=fig_frequencia_categoria, className="dashboard-section"),
-            dcc.Graph(figure=fig_donut_despesas, className="dashboard-section"),
-            dcc.Graph(figure=fig_picos_diario, className="dashboard-section"),
+            dcc.Graph(id='grafico-despesas-mensal', figure=fig_despesas_mensal, className="dashboard-section"),
+            dcc.Graph(id='grafico-gasto-categoria', figure=fig_gasto_categoria, className="dashboard-section"),
+            dcc.Graph(id='grafico-frequencia-categoria', figure=fig_frequencia_categoria, className="dashboard-section"),
+            dcc.Graph(id='grafico-distribuicao-despesas', figure=fig_donut_despesas, className="dashboard-section"),
+            dcc.Graph(id={'type': 'serie-temporal', 'id': 'picos-despesas'}, figure=fig_picos_diario, className="dashboard-section"),
             html.Div(className="dashboard-section", children=[
                 html.H3("Insights e Anomalias", className="text-xl font-semibold mb-2 text-gray-800"),
                 html.Ul(className="list-disc list-inside", children=insights + anomalias)
@@ -554,43 +2436,37 @@ def layout_despesas():
         ])
     ])
 
+# Função para limpar dados de despesas Gestor já lidos do CSV
+def clean_personal_expenses_data(df):
+    # Remover linhas com valores nulos antes de conversão
+    df = df.dropna(subset=['Data', 'Categoria', 'Valor'], how='any').copy()
+
+    # Converter e limpar
+    df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
+    df['Valor'] = df['Valor'].astype(str).str.replace(',', '.', regex=False)
+    df['Valor'] = pd.to_numeric(df['Valor'], errors='coerce')
+    df['Valor'] = df['Valor'].abs()
+
+    # Remover linhas com valores nulos após conversão
+    return df.dropna(subset=['Data', 'Categoria', 'Valor'], how='any')
+
 # Função para carregar e limpar dados de despesas Gestor
 def load_personal_expenses_data(file_path='csv/despesas.csv'):
     try:
-        # Ler o arquivo como texto para verificar linhas
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-        logger.info(f"Total de linhas no arquivo {file_path}: {len(lines)}")
-        
-        # Carregar o DataFrame
-        df = pd.read_csv(
-            file_path, 
-            sep=';', 
-            encoding='utf-8', 
-            on_bad_lines=lambda x: logger.warning(f"Linha inválida ignorada: {x}"), 
-            names=['Data', 'Categoria', 'Valor'], 
-            skiprows=1, 
-            engine='python'
-        )
+        # Contar as linhas lendo o arquivo em blocos, sem carregá-lo como texto
+        total_linhas = count_lines(file_path)
+        logger.info(f"Total de linhas no arquivo {file_path}: {total_linhas}")
+
+        # Carregar o DataFrame (engine C; linhas com campos a mais são ignoradas)
+        df = pd.read_csv(file_path, **PERSONAL_EXPENSES_CSV_OPTIONS)
         logger.info(f"Linhas carregadas antes da limpeza: {len(df)}")
-        
-        # Remover linhas com valores nulos antes de conversão
-        df = df.dropna(subset=['Data', 'Categoria', 'Valor'], how='any')
-        logger.info(f"Linhas após remoção de nulos iniciais: {len(df)}")
-        
-        # Converter e limpar
-        df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
-        df['Valor'] = df['Valor'].astype(str).str.replace(',', '.', regex=False)
-        df['Valor'] = pd.to_numeric(df['Valor'], errors='coerce')
-        df['Valor'] = df['Valor'].apply(lambda x: abs(x) if pd.notnull(x) and x < 0 else x)
-        
-        # Remover linhas com valores nulos após conversão
-        df = df.dropna(subset=['Data', 'Categoria', 'Valor'], how='any')
+        if total_linhas - 1 > len(df):
+            logger.warning(f"{total_linhas - 1 - len(df)} linhas inválidas ou em branco ignoradas em {file_path}")
+
+        df = compact_dtypes(clean_personal_expenses_data(df), PERSONAL_EXPENSES_DTYPES, file_path)
         logger.info(f"Linhas após limpeza final: {len(df)}")
-        logger.info(f"Primeiras linhas de df_despesas_pessoais: \n{df.head().to_string()}")
-        
-        # Verificar transações específicas
-        logger.info(f"Transações para 07/04/2025: \n{df[df['Data'] == '2025-04-07'].to_string()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Primeiras linhas de df_despesas_pessoais: \n{df.head().to_string()}")
         
         if df.empty:
             logger.warning("Nenhum dado válido encontrado após limpeza")
@@ -604,100 +2480,46 @@ def load_personal_expenses_data(file_path='csv/despesas.csv'):
         logger.error(f"Erro ao carregar {file_path}: {str(e)}")
         return pd.DataFrame()
 
-# Carregar os dados de despesas Gestor
-df_despesas_pessoais = load_personal_expenses_data()
-
-# Layout do Dashboard de Despesas Gestor
-def layout_despesas_pessoais():
-    if df_despesas_pessoais.empty:
-        logger.warning("Dados de despesas Gestor vazios ou não carregados")
-        return html.Div("Erro: Dados de despesas Gestor não carregados.")
-    
-    # --- Métricas ---
-    total_despesas = df_despesas_pessoais['Valor'].sum()
-    media_despesa = df_despesas_pessoais['Valor'].mean()
-    num_transacoes = len(df_despesas_pessoais)
+# Agregados de despesas Gestor
+def build_personal_expenses_aggregates(df):
+    return {
+        'kpis': {
+            'total': df['Valor'].sum(),
+            'validas': df['Valor'].count(),
+            'transacoes': len(df),
+        },
+        'categoria': plain_index(df.groupby('Categoria', observed=True)['Valor'].sum()),
+        'categoria_contagem': plain_index(df['Categoria'].value_counts()),
+        'mensal': df.groupby(pd.Grouper(key='Data', freq='ME'))['Valor'].sum(),
+        'diario': df.groupby('Data')['Valor'].sum(),
+        'diario_categoria': plain_index(df.groupby(['Data', 'Categoria'], observed=True)['Valor'].sum()),
+    }
 
-    # --- Gráfico 1: Gasto Total por Categoria (Top 5) ---
-    df_gasto_categoria = df_despesas_pessoais.groupby('Categoria')['Valor'].sum().reset_index()
-    df_gasto_categoria = df_gasto_categoria.sort_values('Valor', ascending=False).head(5)
-    fig_gasto_categoria = px.bar(
-        df_gasto_categoria, y='Categoria', x='Valor',
-        title='Gasto Total por Categoria (Top 5)',
-        labels={'Categoria': 'Categoria', 'Valor': 'Valor (R$)'},
-        color_discrete_sequence=['#e74c3c'],
-        template="plotly_white",
-        orientation='h'
-    )
-    fig_gasto_categoria.update_layout(
-        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
-        margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Valor (R$)", yaxis_title="Categoria",
-        xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
-    )
-
-    # --- Gráfico 2: Frequência de Transações por Categoria (Top 5) ---
-    df_freq_categoria = df_despesas_pessoais['Categoria'].value_counts().reset_index()
-    df_freq_categoria.columns = ['Categoria', 'Contagem']
-    df_freq_categoria = df_freq_categoria.sort_values('Contagem', ascending=False).head(5)
-    fig_freq_categoria = px.bar(
-        df_freq_categoria, x='Categoria', y='Contagem',
-        title='Frequência de Transações por Categoria (Top 5)',
-        labels={'Categoria': 'Categoria', 'Contagem': 'Número de Transações'},
-        color_discrete_sequence=['#3498db'],
-        template="plotly_white"
-    )
-    fig_freq_categoria.update_layout(
-        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
-        margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Categoria", yaxis_title="Número de Transações",
-        xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
-    )
+# Registrar os dados de despesas Gestor
+register_dataset('despesas_pessoais', 'csv/despesas.csv', load_personal_expenses_data, build_personal_expenses_aggregates,
+                 clean_personal_expenses_data, PERSONAL_EXPENSES_CSV_OPTIONS, dtypes=PERSONAL_EXPENSES_DTYPES,
+                 sql_aggregator=sql_personal_expenses_aggregates, partition_column='Data')
 
-    # --- Gráfico 3: Gasto Mensal ao Longo do Tempo ---
-    df_gasto_mensal = df_despesas_pessoais.groupby(pd.Grouper(key='Data', freq='ME'))['Valor'].sum().reset_index()
-    fig_gasto_mensal = px.line(
-        df_gasto_mensal, x='Data', y='Valor',
-        title='Gasto Mensal ao Longo do Tempo',
-        labels={'Data': 'Mês', 'Valor': 'Valor (R$)'},
-        color_discrete_sequence=['#e74c3c'],
-        template="plotly_white"
-    )
-    fig_gasto_mensal.update_layout(
-        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
-        margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Mês", yaxis_title="Valor (R$)",
-        xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
-    )
-    fig_gasto_mensal.update_yaxes(rangemode='tozero')
-    fig_gasto_mensal.update_traces(hovertemplate='Mês: %{x|%b %Y}<br>Valor: R$ %{y:,.2f}')
-
-    # --- Gráfico 4: Distribuição de Gastos (Rosca) ---
-    df_distribuicao = df_despesas_pessoais.groupby('Categoria')['Valor'].sum().reset_index()
-    df_distribuicao = df_distribuicao.sort_values('Valor', ascending=False)
-    top_categorias = df_distribuicao.head(6)
-    outros_valor = df_distribuicao['Valor'][6:].sum()
-    df_distribuicao_final = pd.concat([
-        top_categorias,
-        pd.DataFrame({'Categoria': ['Outros'], 'Valor': [outros_valor]})
-    ])
-    fig_distribuicao = px.pie(
-        df_distribuicao_final, values='Valor', names='Categoria',
-        title='Distribuição de Gastos',
-        hole=0.5, template="plotly_white",
-        color_discrete_sequence=px.colors.qualitative.Pastel
-    )
-    fig_distribuicao.update_layout(
-        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
-        margin=dict(l=40, r=40, t=60, b=40), legend_title_text='Categoria', title_x=0.5
-    )
-    fig_distribuicao.update_traces(hovertemplate='Categoria: %{label}<br>Valor: R$ %{value:,.2f}<br>Porcentagem: %{percent}')
+# Sem a carga sob demanda, todos os conjuntos são lidos na importação, já com
+# todos registrados: os fatos dependem dos cadastros (ver enrich_with_dimensions)
+if not DATA_LAZY_LOAD and multiprocessing.parent_process() is None:  # Processos do pool de ingestão não carregam nada
+    load_all_datasets()
 
-    # --- Gráfico 5: Picos de Gasto Diário ---
-    df_gasto_diario = df_despesas_pessoais.groupby('Data')['Valor'].sum().reset_index()
-    df_top_categoria = df_despesas_pessoais.groupby(['Data', 'Categoria'])['Valor'].sum().reset_index()
+# Gasto diário com a categoria de maior valor em cada dia
+@timed_stage('agregacao')
+def daily_top_category(agregados):
+    df_gasto_diario = agregados['diario'].reset_index()
+    df_top_categoria = agregados['diario_categoria'].reset_index()
     df_top_categoria = df_top_categoria.loc[df_top_categoria.groupby('Data')['Valor'].idxmax()].drop_duplicates(subset=['Data'])
     df_gasto_diario = df_gasto_diario.merge(df_top_categoria[['Data', 'Categoria']], on='Data', how='left')
     df_gasto_diario['Categoria'] = df_gasto_diario['Categoria'].fillna('Desconhecida')
-    logger.info(f"df_gasto_diario após merge: \n{df_gasto_diario.to_string()}")
-    logger.info(f"Total para 07/04/2025 em df_gasto_diario: \n{df_gasto_diario[df_gasto_diario['Data'] == '2025-04-07'].to_string()}")
+    return df_gasto_diario
+
+# Gráfico de Dispersão: Picos de Gasto Diário (colorido pela categoria do dia)
+@timed_stage('figuras')
+def build_fig_picos_despesas_pessoais(agregados, start=None, end=None):
+    df_gasto_diario = daily_top_category(agregados)
+    df_gasto_diario = downsample_minmax(slice_time_range(df_gasto_diario, 'Data', start, end), 'Data', ['Valor'])
     fig_picos_diario = px.scatter(
         df_gasto_diario, x='Data', y='Valor',
         title='Picos de Gasto Diário',
@@ -739,6 +2561,98 @@ def layout_despesas_pessoais():
     fig_picos_diario.update_traces(
         hovertemplate='Data: %{x|%d/%m/%Y}<br>Valor: R$ %{y:,.2f}<br>Categoria: %{customdata}'
     )
+    return apply_time_range(fig_picos_diario, start, end)
+
+# Layout do Dashboard de Despesas Gestor
+def layout_despesas_pessoais():
+    agregados = get_aggregates('despesas_pessoais')
+    if not agregados:
+        logger.warning("Dados de despesas Gestor vazios ou não carregados")
+        return html.Div("Erro: Dados de despesas Gestor não carregados.")
+
+    # --- Métricas ---
+    total_despesas = agregados['kpis']['total']
+    media_despesa = total_despesas / agregados['kpis']['validas']
+    num_transacoes = agregados['kpis']['transacoes']
+
+    with stage('figuras'):
+        # --- Gráfico 1: Gasto Total por Categoria (Top 5) ---
+        df_gasto_categoria = agregados['categoria'].reset_index()
+        df_gasto_categoria = df_gasto_categoria.sort_values('Valor', ascending=False).head(5)
+        fig_gasto_categoria = px.bar(
+            df_gasto_categoria, y='Categoria', x='Valor',
+            title='Gasto Total por Categoria (Top 5)',
+            labels={'Categoria': 'Categoria', 'Valor': 'Valor (R$)'},
+            color_discrete_sequence=['#e74c3c'],
+            template="plotly_white",
+            orientation='h'
+        )
+        fig_gasto_categoria.update_layout(
+            plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
+            margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Valor (R$)", yaxis_title="Categoria",
+            xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
+        )
+
+        # --- Gráfico 2: Frequência de Transações por Categoria (Top 5) ---
+        df_freq_categoria = agregados['categoria_contagem'].reset_index()
+        df_freq_categoria.columns = ['Categoria', 'Contagem']
+        df_freq_categoria = df_freq_categoria.sort_values('Contagem', ascending=False).head(5)
+        fig_freq_categoria = px.bar(
+            df_freq_categoria, x='Categoria', y='Contagem',
+            title='Frequência de Transações por Categoria (Top 5)',
+            labels={'Categoria': 'Categoria', 'Contagem': 'Número de Transações'},
+            color_discrete_sequence=['#3498db'],
+            template="plotly_white"
+        )
+        fig_freq_categoria.update_layout(
+            plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
+            margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Categoria", yaxis_title="Número de Transações",
+            xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
+        )
+
+        # --- Gráfico 3: Gasto Mensal ao Longo do Tempo ---
+        df_gasto_mensal = agregados['mensal'].reset_index()
+        fig_gasto_mensal = px.line(
+            df_gasto_mensal, x='Data', y='Valor',
+            title='Gasto Mensal ao Longo do Tempo',
+            labels={'Data': 'Mês', 'Valor': 'Valor (R$)'},
+            color_discrete_sequence=['#e74c3c'],
+            template="plotly_white"
+        )
+        fig_gasto_mensal.update_layout(
+            plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
+            margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Mês", yaxis_title="Valor (R$)",
+            xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
+        )
+        fig_gasto_mensal.update_yaxes(rangemode='tozero')
+        fig_gasto_mensal.update_traces(hovertemplate='Mês: %{x|%b %Y}<br>Valor: R$ %{y:,.2f}')
+
+        # --- Gráfico 4: Distribuição de Gastos (Rosca) ---
+        df_distribuicao = agregados['categoria'].reset_index()
+        df_distribuicao = df_distribuicao.sort_values('Valor', ascending=False)
+        top_categorias = df_distribuicao.head(6)
+        outros_valor = df_distribuicao['Valor'][6:].sum()
+        df_distribuicao_final = pd.concat([
+            top_categorias,
+            pd.DataFrame({'Categoria': ['Outros'], 'Valor': [outros_valor]})
+        ])
+        fig_distribuicao = px.pie(
+            df_distribuicao_final, values='Valor', names='Categoria',
+            title='Distribuição de Gastos',
+            hole=0.5, template="plotly_white",
+            color_discrete_sequence=px.colors.qualitative.Pastel
+        )
+        fig_distribuicao.update_layout(
+            plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
+            margin=dict(l=40, r=40, t=60, b=40), legend_title_text='Categoria', title_x=0.5
+        )
+        fig_distribuicao.update_traces(hovertemplate='Categoria: %{label}<br>Valor: R$ %{value:,.2f}<br>Porcentagem: %{percent}')
+
+    # --- Gráfico 5: Picos de Gasto Diário ---
+    df_gasto_diario = daily_top_category(agregados)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"df_gasto_diario após merge: \n{df_gasto_diario.to_string()}")
+    fig_picos_diario = build_fig_picos_despesas_pessoais(agregados)
 
     # --- Análise de Insights e Anomalias ---
     top_categoria = df_gasto_categoria.iloc[0]['Categoria']
@@ -784,36 +2698,34 @@ def layout_despesas_pessoais():
             dcc.Graph(figure=fig_freq_categoria, className="dashboard-section"),
             dcc.Graph(figure=fig_gasto_mensal, className="dashboard-section"),
             dcc.Graph(figure=fig_distribuicao, className="dashboard-section"),
-            dcc.Graph(figure=fig_picos_diario, className="dashboard-section"),
+            dcc.Graph(id={'type': 'serie-temporal', 'id': 'picos-despesas-pessoais'}, figure=fig_picos_diario, className="dashboard-section"),
             html.Div(insights, className="dashboard-section")
         ])
     ])
 
 def layout_geral():
-    total_financeiro_geral = df_financeiro['Valor'].sum() if not df_financeiro.empty else 0
-    total_envios_geral = len(df_logistica) if not df_logistica.empty else 0
-    total_vendas_geral = df_vendas['Total'].sum() if not df_vendas.empty else 0
-    # Métricas resumidas
-    total_entradas = df_financeiro[df_financeiro['Tipo'] == 'Entradas']['Valor'].sum() if not df_financeiro.empty else 0
-    total_saidas = abs(df_financeiro[df_financeiro['Tipo'] == 'Saídas']['Valor'].sum()) if not df_financeiro.empty else 0
-    saldo_total = total_entradas + (df_financeiro[df_financeiro['Tipo'] == 'Saídas']['Valor'].sum() if not df_financeiro.empty else 0)
-    total_envios = len(df_logistica) if not df_logistica.empty else 0
-    total_pedidos = len(df_vendas) if not df_vendas.empty else 0
-    total_vendas = df_vendas['Total'].sum() if not df_vendas.empty else 0
-    total_despesas = abs(df_financeiro[df_financeiro['Tipo'] == 'Saídas']['Valor'].sum()) if not df_financeiro.empty else 0
-
-    kpi_data = pd.DataFrame({
-        'Indicador': ['Saldo Financeiro', 'Total de Embarques', 'Total de Vendas'],
-        'Valor': [total_financeiro_geral, total_envios_geral, total_vendas_geral]
-    })
-    fig_kpi = px.bar(kpi_data, x='Indicador', y='Valor',
-                     title='Resumo Geral de KPIs',
-                     color_discrete_sequence=px.colors.qualitative.Set3)
-    fig_kpi.update_layout(
-        plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
-        margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Indicador", yaxis_title="Valor",
-        xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
-    )
+    # KPIs pré-calculados (vazios quando o conjunto de dados não foi carregado)
+    kpis_financeiro = get_aggregates('financeiro').get('kpis', {})
+    kpis_logistica = get_aggregates('logistica').get('kpis', {})
+    kpis_vendas = get_aggregates('vendas').get('kpis', {})
+    total_financeiro_geral = kpis_financeiro.get('total_valor', 0)
+    total_envios_geral = kpis_logistica.get('total_envios', 0)
+    total_vendas_geral = kpis_vendas.get('total_vendas', 0)
+    total_despesas = abs(kpis_financeiro.get('total_saidas', 0))
+
+    with stage('figuras'):
+        kpi_data = pd.DataFrame({
+            'Indicador': ['Saldo Financeiro', 'Total de Embarques', 'Total de Vendas'],
+            'Valor': [total_financeiro_geral, total_envios_geral, total_vendas_geral]
+        })
+        fig_kpi = px.bar(kpi_data, x='Indicador', y='Valor',
+                         title='Resumo Geral de KPIs',
+                         color_discrete_sequence=px.colors.qualitative.Set3)
+        fig_kpi.update_layout(
+            plot_bgcolor='white', paper_bgcolor='white', font_color='#2c3e50',
+            margin=dict(l=40, r=40, t=60, b=40), xaxis_title="Indicador", yaxis_title="Valor",
+            xaxis=dict(showgrid=True, gridcolor='#e0e0e0'), yaxis=dict(showgrid=True, gridcolor='#e0e0e0')
+        )
 
     return html.Div([
         html.H2("Visão Geral dos Dashboards", className="text-2xl font-bold mb-4 text-gray-800"),
@@ -873,42 +2785,904 @@ def layout_geral():
         ])
     ])
 
+# --- 6. Cache de Layouts por Página ---
+# Quando os dados de uma página mudam, a página não é reconstruída dentro da
+# requisição: enquanto uma thread de fundo monta o layout da nova versão, as
+# requisições continuam recebendo a última versão construída, que exibe a
+# data dos dados ("Dados de ..."). Só a primeira construção de cada página
+# (sem versão anterior) é feita na requisição.
+
+# Número máximo de layouts mantidos em memória (descarte LRU)
+PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', '32'))
+PAGE_REFRESH_BACKGROUND = os.environ.get('PAGE_REFRESH_BACKGROUND', '1') == '1'
+
+# Conjuntos de dados de que cada página depende
+PAGE_DATASETS = {
+    '/': ['financeiro', 'logistica', 'vendas'],
+    '/financeiro': ['financeiro', 'setores'],
+    '/logistica': ['logistica', 'operadores', 'paises', 'excecoes'],
+    '/vendas': ['vendas'],
+    '/despesas': ['financeiro'],
+    '/despesas-pessoais': ['despesas_pessoais'],
+}
+
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+_page_build_locks = {}
+_page_current = {}  # Página -> chave do último layout construído
+_refresh_queue = queue.Queue()
+_refresh_pending = set()
+_refresher_pid = None
+
+# Chave de cache de uma página: a rota e as versões dos conjuntos de que depende
+def page_cache_key(page):
+    return (page, tuple(dataset_version(name) for name in PAGE_DATASETS.get(page, [])))
+
+# Data dos dados de uma chave: a modificação mais recente dos CSVs da página
+def data_as_of(key):
+    stamps = [version[0] for version in key[1] if version is not None]
+    return datetime.fromtimestamp(max(stamps) / 1e9) if stamps else None
+
+def data_as_of_label(key):
+    stamp = data_as_of(key)
+    return html.Div(f"Dados de {stamp:%d/%m/%Y %H:%M}" if stamp else "Dados indisponíveis",
+                    style={'textAlign': 'right', 'color': '#7f8c8d', 'fontSize': '0.85em', 'marginBottom': '8px'})
+
+# Retorna o layout da página em cache; se os dados mudaram e há uma versão
+# anterior, retorna a anterior e agenda a reconstrução em segundo plano
+def cached_layout(page, builder):
+    key = page_cache_key(page)
+    with _page_cache_lock:
+        if key in _page_cache:
+            _page_cache.move_to_end(key)
+            _request_state.page_key = key
+            return _page_cache[key]
+        stale_key = _page_current.get(page) if PAGE_REFRESH_BACKGROUND else None
+        stale = _page_cache.get(stale_key) if stale_key is not None else None
+    if stale is not None:
+        schedule_page_refresh(page)
+        _request_state.page_key = stale_key
+        return stale
+    layout = build_page(page, builder, key)
+    _request_state.page_key = key
+    return layout
+
+# Constrói o layout de uma versão da página (uma única vez) e o publica como
+# a versão atual, descartando as versões anteriores
+def build_page(page, builder, key):
+    with _page_cache_lock:
+        build_lock = _page_build_locks.setdefault(page, threading.Lock())
+
+    # Apenas uma thread constrói cada página; as demais aguardam o resultado
+    with build_lock:
+        with _page_cache_lock:
+            if key in _page_cache:
+                _page_cache.move_to_end(key)
+                return _page_cache[key]
+        with stage('layout'):
+            layout = html.Div([data_as_of_label(key), builder()])
+        with _page_cache_lock:
+            for old_key in [k for k in _page_cache if k[0] == page]:
+                del _page_cache[old_key]
+            _page_cache[key] = layout
+            _page_current[page] = key
+            while len(_page_cache) > PAGE_CACHE_SIZE:
+                _page_cache.popitem(last=False)
+        with _response_cache_lock:
+            for old_key in [k for k in _response_cache if k[0] == page and k != key]:
+                del _response_cache[old_key]
+    logger.info(f"Layout da página {page} construído e armazenado em cache")
+    return layout
+
+def _refresh_pages():
+    while True:
+        page = _refresh_queue.get()
+        with _page_cache_lock:
+            _refresh_pending.discard(page)
+        try:
+            start = time.perf_counter()
+            key = page_cache_key(page)
+            with _page_cache_lock:
+                current = key in _page_cache
+            if not current:
+                build_page(page, PAGE_LAYOUTS[page], key)
+                logger.info(f"Página {page} reconstruída em segundo plano em {time.perf_counter() - start:.2f}s")
+            if STATIC_EXPORT_DIR:
+                export_static(STATIC_EXPORT_DIR, [page])
+        except Exception as e:
+            logger.error(f"Erro ao reconstruir a página {page}: {str(e)}")
+
+# Agenda a reconstrução de uma página (uma vez, mesmo com pedidos repetidos);
+# a thread de reconstrução é iniciada uma vez por processo
+def schedule_page_refresh(page):
+    global _refresher_pid
+    with _page_cache_lock:
+        if _refresher_pid != os.getpid():
+            _refresher_pid = os.getpid()
+            _refresh_pending.clear()
+            threading.Thread(target=_refresh_pages, name='page-refresh', daemon=True).start()
+        if page in _refresh_pending:
+            return
+        _refresh_pending.add(page)
+    _refresh_queue.put(page)
+
+# Após uma recarga dos dados: reconstrói em segundo plano as páginas já
+# exibidas (servindo a versão anterior até lá) ou apenas invalida o cache
+def refresh_page(page):
+    if PAGE_REFRESH_BACKGROUND and page in _page_current:
+        schedule_page_refresh(page)
+    else:
+        invalidate_page_cache(page)
+
+# Invalida o cache de uma página (ou de todas, se page for None)
+def invalidate_page_cache(page=None):
+    with _page_cache_lock:
+        if page is None:
+            _page_cache.clear()
+            _page_current.clear()
+        else:
+            for key in [k for k in _page_cache if k[0] == page]:
+                del _page_cache[key]
+            _page_current.pop(page, None)
+    with _response_cache_lock:
+        if page is None:
+            _response_cache.clear()
+        else:
+            for key in [k for k in _response_cache if k[0] == page]:
+                del _response_cache[key]
+    logger.info(f"Cache de layouts invalidado: {page or 'todas as páginas'}")
+
+# --- Importação de CSV ---
+# Novos CSVs dos fatos podem ser enviados pelo painel de importação. A
+# requisição só inicia uma thread de fundo, que decodifica o conteúdo do
+# dcc.Upload (texto base64) em trechos direto para um arquivo em UPLOAD_DIR,
+# sem montar os bytes inteiros nem uma cópia em texto, e faz a validação, a
+# limpeza e os agregados com a mesma leitura em blocos dos carregadores
+# (cleaner + esquema compacto). Só
+# um arquivo válido substitui o CSV do conjunto (troca atômica de arquivo) e é
+# publicado por troca de referência, sem bloquear as requisições; os demais
+# workers o recarregam pelo monitoramento de csv/. O progresso de cada
+# importação fica num arquivo de estado, lido por qualquer worker.
+
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR', 'csv/.uploads')  # No mesmo sistema de arquivos de csv/
+UPLOAD_MAX_MB = float(os.environ.get('UPLOAD_MAX_MB', '200'))
+UPLOAD_DECODE_CHUNK = 4 * 2**18  # Caracteres base64 decodificados por vez (múltiplo de 4)
+
+# Conjuntos que aceitam importação e o nome exibido
+UPLOAD_DATASETS = {
+    'financeiro': 'Financeiro',
+    'logistica': 'Logística',
+    'vendas': 'Vendas',
+    'despesas_pessoais': 'Despesas Gestor',
+}
+
+# Arquivo de estado de uma importação. job vem do navegador (dcc.Store): só
+# identificadores gerados por start_upload (uuid4 em hexadecimal) viram caminho
+def upload_status_path(job):
+    if not isinstance(job, str) or not re.fullmatch(r'[0-9a-f]{32}', job):
+        raise ValueError(f"Identificador de importação inválido: {job!r}")
+    return os.path.join(UPLOAD_DIR, f"{job}.json")
+
+# Grava o estado de uma importação (troca atômica do arquivo de estado)
+def write_upload_status(job, **status):
+    path = upload_status_path(job)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(status, file)
+    os.replace(path + '.tmp', path)
+
+def read_upload_status(job):
+    try:
+        with open(upload_status_path(job), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+# Decodifica o conteúdo de um dcc.Upload ('data:<tipo>;base64,<dados>') para
+# um arquivo, um trecho de UPLOAD_DECODE_CHUNK caracteres por vez, informando
+# a fração já decodificada a progress
+def decode_upload(contents, path, progress=None):
+    start = contents.index(',') + 1
+    with open(path, 'wb') as file:
+        for offset in range(start, len(contents), UPLOAD_DECODE_CHUNK):
+            file.write(base64.b64decode(contents[offset:offset + UPLOAD_DECODE_CHUNK], validate=True))
+            if progress is not None:
+                progress(min(offset + UPLOAD_DECODE_CHUNK, len(contents)) / len(contents))
+
+# Colunas do CSV atual do conjunto que não estão no CSV enviado
+def missing_columns(spec, upload_path):
+    if 'names' in spec.read_options or not os.path.exists(spec.file_path):
+        return []  # Cabeçalho fixo (despesas.csv) ou sem CSV de referência
+    expected = pd.read_csv(spec.file_path, nrows=0, **spec.read_options).columns
+    received = set(pd.read_csv(upload_path, nrows=0, **spec.read_options).columns)
+    return [column for column in expected if column not in received]
+
+# Decodifica, valida, limpa e publica o CSV enviado (executado em segundo plano)
+def ingest_upload(job, name, contents, upload_path, filename):
+    spec = _dataset_loaders[name]
+
+    validated = {'rows': 0}
+
+    def report(status, progress, message):
+        write_upload_status(job, dataset=name, file=filename, status=status, progress=progress, message=message)
+
+    def on_decode(fraction):
+        report('recebendo', round(0.2 * fraction, 3), f"{fraction:.0%} do arquivo decodificado")
+
+    def on_block(fraction, rows):
+        validated['rows'] = rows
+        report('processando', round(0.2 + 0.7 * fraction, 3), f"{rows} linhas validadas")
+
+    try:
+        decode_upload(contents, upload_path, progress=on_decode)
+    except ValueError as e:  # Conteúdo que não é base64 válido
+        logger.error(f"Erro ao decodificar {filename}: {str(e)}")
+        report('erro', 1, "Erro: arquivo inválido")
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+        return
+    try:
+        missing = missing_columns(spec, upload_path)
+        if missing:
+            raise ValueError(f"colunas ausentes: {', '.join(missing)}")
+        df, aggregates = stream_csv(upload_path, spec.cleaner, spec.read_options, spec.aggregator, spec.dtypes,
+                                    progress=on_block)
+        rows = validated['rows']
+        if not rows:
+            raise ValueError("nenhuma linha válida")
+        report('publicando', 0.95, f"{rows} linhas validadas; publicando")
+        with _reload_lock:  # Sem recarga simultânea pelo monitoramento de csv/
+            os.replace(upload_path, spec.file_path)
+            _pending_versions.pop(name, None)
+            if uses_database(spec):
+                reload_dataset(name)
+            else:
+                reload_dataset(name, preloaded=(file_version(spec.file_path), df, aggregates))
+        for page, names in PAGE_DATASETS.items():
+            if name in names:
+                refresh_page(page)
+        logger.info(f"Importação de {filename} publicada em '{name}' ({rows} linhas)")
+        report('concluido', 1, f"{rows} linhas publicadas em {spec.file_path}")
+    except Exception as e:
+        logger.error(f"Erro na importação de {filename} para '{name}': {str(e)}")
+        report('erro', 1, f"Erro: {str(e)}")
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+# Inicia a decodificação e a ingestão do arquivo enviado em segundo plano; retorna o id da importação
+def start_upload(name, contents, filename):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    job = uuid.uuid4().hex
+    upload_path = os.path.join(UPLOAD_DIR, f"{job}.csv")
+    write_upload_status(job, dataset=name, file=filename, status='na fila', progress=0, message="Arquivo recebido")
+    threading.Thread(target=ingest_upload, args=(job, name, contents, upload_path, filename), name=f'upload-{job[:8]}',
+                     daemon=True).start()
+    return job
+
+# Painel de importação exibido acima das páginas
+def upload_bar():
+    return html.Div(className="card-container", children=[
+        dcc.Dropdown(
+            id='upload-dataset', value='financeiro', clearable=False, style={'minWidth': '280px'},
+            options=[{'label': f"{label} ({os.path.basename(_dataset_loaders[name].file_path)})", 'value': name}
+                     for name, label in UPLOAD_DATASETS.items()]
+        ),
+        dcc.Upload(
+            id='upload-csv', accept='.csv,text/csv', max_size=int(UPLOAD_MAX_MB * 2**20),
+            children=html.Div(["Arraste ou ", html.A("selecione um CSV")]),
+            style={'border': '1px dashed #95a5a6', 'borderRadius': '8px', 'padding': '8px 20px', 'cursor': 'pointer'}
+        ),
+        html.Div(id='upload-status'),
+        dcc.Store(id='upload-job'),
+        dcc.Interval(id='upload-progress', interval=1000, disabled=True),
+    ])
+
+def upload_status_view(status):
+    return html.Div([
+        html.Progress(value=str(status['progress']), max='1', style={'marginRight': '8px'}),
+        html.Span(f"{status['file']}: {status['message']}"),
+    ])
+
 # --- 7. Configuração de Rotas ---
+# Cabeçalho e navegação (também usados pela exportação estática)
+PAGE_HEADER = html.Div(className="header", children=[
+    html.H1("Dashboard Geral da Empresa", className="text-4xl font-bold"),
+])
+NAV_BAR = html.Div(className="nav-bar", children=[
+    dcc.Link("Geral", href="/", className="nav-link"),
+    dcc.Link("Financeiro", href="/financeiro", className="nav-link"),
+    dcc.Link("Logística", href="/logistica", className="nav-link"),
+    dcc.Link("Vendas", href="/vendas", className="nav-link"),
+    dcc.Link("Despesas", href="/despesas", className="nav-link"),
+    dcc.Link("Despesas Gestor", href="/despesas-pessoais", className="nav-link"),
+])
+
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
-    html.Div(className="header", children=[
-        html.H1("Dashboard Geral da Empresa", className="text-4xl font-bold"),
-    ]),
-    html.Div(className="nav-bar", children=[
-        dcc.Link("Geral", href="/", className="nav-link"),
-        dcc.Link("Financeiro", href="/financeiro", className="nav-link"),
-        dcc.Link("Logística", href="/logistica", className="nav-link"),
-        dcc.Link("Vendas", href="/vendas", className="nav-link"),
-        dcc.Link("Despesas", href="/despesas", className="nav-link"),
-        dcc.Link("Despesas Gestor", href="/despesas-pessoais", className="nav-link"),
-    ]),
+    PAGE_HEADER,
+    NAV_BAR,
+    upload_bar(),
     html.Div(id='page-content', className="content")
 ])
 
+# Função de layout de cada rota
+PAGE_LAYOUTS = {
+    '/': layout_geral,
+    '/financeiro': layout_financeiro,
+    '/logistica': layout_logistica,
+    '/vendas': layout_vendas,
+    '/despesas': layout_despesas,
+    '/despesas-pessoais': layout_despesas_pessoais,
+}
+
 # Callback para navegação entre páginas
 @callback(
     Output('page-content', 'children'),
     Input('url', 'pathname')
 )
 def display_page(pathname):
-    if pathname == '/financeiro':
-        return layout_financeiro()
-    elif pathname == '/logistica':
-        return layout_logistica()
-    elif pathname == '/vendas':
-        return layout_vendas()
-    elif pathname == '/despesas':
-        return layout_despesas()
-    elif pathname == '/despesas-pessoais':
-        return layout_despesas_pessoais()
+    page = pathname if pathname in PAGE_LAYOUTS else '/'
+    return cached_layout(page, PAGE_LAYOUTS[page])
+
+# Conjunto de dados e construtor de cada gráfico de série temporal, pelo id usado no layout
+TIME_SERIES_FIGURES = {
+    'entradas-saidas': ('financeiro', build_fig_entradas_saidas),
+    'saldo-tempo': ('financeiro', build_fig_saldo_tempo),
+    'picos-despesas': ('financeiro', build_fig_picos_despesas),
+    'picos-despesas-pessoais': ('despesas_pessoais', build_fig_picos_despesas_pessoais),
+}
+
+# Callback de zoom: reconstrói apenas o gráfico alterado com o trecho visível
+# (respeitando os filtros da página, se houver)
+@callback(
+    Output({'type': 'serie-temporal', 'id': MATCH}, 'figure'),
+    Input({'type': 'serie-temporal', 'id': MATCH}, 'relayoutData'),
+    State({'type': 'filtro-periodo', 'page': ALL}, 'start_date'),
+    State({'type': 'filtro-periodo', 'page': ALL}, 'end_date'),
+    State({'type': 'filtro', 'page': ALL, 'campo': ALL}, 'value'),
+    prevent_initial_call=True
+)
+def zoom_time_series(relayout_data, start_dates, end_dates, selections):
+    relayout_data = relayout_data or {}
+    if relayout_data.get('xaxis.autorange'):
+        start, end = None, None
+    elif 'xaxis.range[0]' in relayout_data:
+        start, end = relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    elif 'xaxis.range' in relayout_data:
+        start, end = relayout_data['xaxis.range']
+    else:
+        raise PreventUpdate  # Eventos sem mudança no eixo x (ex.: autosize)
+    dataset, builder = TIME_SERIES_FIGURES[ctx.triggered_id['id']]
+    page = ctx.states_list[0][0]['id']['page'] if ctx.states_list[0] else None
+    if page is not None and PAGE_FILTERS[page]['dataset'] == dataset:
+        campos = [item['id']['campo'] for item in ctx.states_list[2]]
+        agregados = filtered_aggregates(page, start_dates[0], end_dates[0], dict(zip(campos, selections)))
+    else:
+        agregados = get_aggregates(dataset)
+    if not agregados:
+        raise PreventUpdate
+    return builder(agregados, start, end)
+
+# Callbacks de filtro: cada um atualiza apenas os gráficos da sua página
+@callback(
+    Output({'type': 'serie-temporal', 'id': 'entradas-saidas'}, 'figure', allow_duplicate=True),
+    Output({'type': 'serie-temporal', 'id': 'saldo-tempo'}, 'figure', allow_duplicate=True),
+    Output('grafico-categorias', 'figure'),
+    Output('grafico-despesas-setor', 'figure'),
+    Input({'type': 'filtro-periodo', 'page': 'financeiro'}, 'start_date'),
+    Input({'type': 'filtro-periodo', 'page': 'financeiro'}, 'end_date'),
+    Input({'type': 'filtro', 'page': 'financeiro', 'campo': 'categoria'}, 'value'),
+    Input({'type': 'filtro', 'page': 'financeiro', 'campo': 'setor'}, 'value'),
+    prevent_initial_call=True
+)
+def filter_financeiro(start_date, end_date, categorias, setores):
+    agregados = filtered_aggregates('financeiro', start_date, end_date, {'categoria': categorias, 'setor': setores})
+    return [figure_patch(build(agregados)) for build in (
+        build_fig_entradas_saidas, build_fig_saldo_tempo, build_fig_categorias, build_fig_despesas_setor)]
+
+@callback(
+    Output('grafico-tipo-servico', 'figure'),
+    Output('grafico-otd', 'figure'),
+    Output('grafico-lead-time-operador', 'figure'),
+    Output('grafico-otd-origem', 'figure'),
+    Output('tabela-excecoes', 'children'),
+    Input({'type': 'filtro-periodo', 'page': 'logistica'}, 'start_date'),
+    Input({'type': 'filtro-periodo', 'page': 'logistica'}, 'end_date'),
+    Input({'type': 'filtro', 'page': 'logistica', 'campo': 'tipo-servico'}, 'value'),
+    prevent_initial_call=True
+)
+def filter_logistica(start_date, end_date, tipos_servico):
+    agregados = filtered_aggregates('logistica', start_date, end_date, {'tipo-servico': tipos_servico})
+    metricas = get_logistics_metrics() if agregados is get_aggregates('logistica') else logistics_metrics(agregados)
+    return [figure_patch(build(agregados)) for build in (build_fig_tipo_servico, build_fig_otd)] + [
+        figure_patch(build_fig_lead_time_operador(metricas)), figure_patch(build_fig_otd_origem(metricas)),
+        build_tabela_excecoes(metricas)]
+
+@callback(
+    Output('grafico-despesas-mensal', 'figure'),
+    Output('grafico-gasto-categoria', 'figure'),
+    Output('grafico-frequencia-categoria', 'figure'),
+    Output('grafico-distribuicao-despesas', 'figure'),
+    Output({'type': 'serie-temporal', 'id': 'picos-despesas'}, 'figure', allow_duplicate=True),
+    Input({'type': 'filtro-periodo', 'page': 'despesas'}, 'start_date'),
+    Input({'type': 'filtro-periodo', 'page': 'despesas'}, 'end_date'),
+    Input({'type': 'filtro', 'page': 'despesas', 'campo': 'categoria'}, 'value'),
+    prevent_initial_call=True
+)
+def filter_despesas(start_date, end_date, categorias):
+    agregados = filtered_aggregates('despesas', start_date, end_date, {'categoria': categorias})
+    return [figure_patch(build(agregados)) for build in (
+        build_fig_despesas_mensal, build_fig_gasto_categoria, build_fig_frequencia_categoria,
+        build_fig_distribuicao_despesas, build_fig_picos_despesas)]
+
+# Importação de CSV: recebe o arquivo e acompanha o progresso da ingestão
+@callback(
+    Output('upload-job', 'data'),
+    Output('upload-progress', 'disabled'),
+    Output('upload-status', 'children'),
+    Input('upload-csv', 'contents'),
+    State('upload-csv', 'filename'),
+    State('upload-dataset', 'value'),
+    prevent_initial_call=True
+)
+def receive_upload(contents, filename, name):
+    if not contents:
+        raise PreventUpdate
+    if not (filename or '').lower().endswith('.csv'):
+        return None, True, f"{filename}: envie um arquivo .csv"
+    job = start_upload(name, contents, filename)
+    return job, False, upload_status_view(read_upload_status(job))
+
+@callback(
+    Output('upload-status', 'children', allow_duplicate=True),
+    Output('upload-progress', 'disabled', allow_duplicate=True),
+    Input('upload-progress', 'n_intervals'),
+    State('upload-job', 'data'),
+    prevent_initial_call=True
+)
+def upload_progress(n_intervals, job):
+    status = read_upload_status(job) if job else None
+    if status is None:
+        raise PreventUpdate
+    done = status.get('status') in ('concluido', 'erro')
+    if done:
+        try:
+            os.remove(upload_status_path(job))
+        except OSError:
+            pass  # Já removido por outro worker
+    return upload_status_view(status), done
+
+# Monitoramento de alterações em csv/ (recarga a quente) e aquecimento dos
+# dados. Iniciados na primeira requisição de cada processo: com preload_app no
+# Gunicorn o módulo é importado no processo mestre, e threads criadas antes do
+# fork não existem nos workers.
+@server.before_request
+def _start_background_threads():
+    start_csv_watcher()
+    start_warmup()
+
+# --- Métricas de Latência e Perfilador ---
+# Cada requisição é cronometrada do primeiro ao último hook do Flask (inclui
+# as respostas servidas do cache serializado e a compressão). A duração total
+# vai para um histograma por rota e o tempo de cada etapa (ver stage) para um
+# histograma por rota e etapa, expostos em /metrics no formato texto do
+# Prometheus e, por requisição, no cabeçalho Server-Timing. Os histogramas são
+# por processo: com vários workers do Gunicorn, cada coleta vê um deles.
+#
+# O perfilador por amostragem é opcional: com PROFILE_REQUESTS=1 toda
+# requisição é amostrada e as mais lentas que PROFILE_SLOW_MS têm as pilhas
+# gravadas; com PROFILE_HEADER=1, uma requisição com o cabeçalho
+# 'X-Profile: 1' é amostrada e gravada sempre. As pilhas vão para PROFILE_DIR
+# no formato "collapsed" (uma pilha por linha com a contagem de amostras),
+# pronto para flamegraph.pl ou speedscope.
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '0') == '1'
+PROFILE_HEADER = os.environ.get('PROFILE_HEADER', '0') == '1'
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '500'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+
+_histograms = {}  # (métrica, rótulos) -> [contagem por balde, soma, contagem]
+_histograms_lock = threading.Lock()
+_profiled_threads = {}  # id da thread -> Counter de pilhas amostradas
+_profiled_lock = threading.Lock()
+_sampler_pid = None
+
+# Registra uma observação (em segundos) no histograma da métrica com os rótulos dados
+def observe(metric, labels, seconds):
+    key = (metric, tuple(labels.items()))
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * len(METRICS_BUCKETS), 0.0, 0]
+        for i, bound in enumerate(METRICS_BUCKETS):
+            if seconds <= bound:
+                histogram[0][i] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+def _label_text(labels):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped))
+
+# Histogramas no formato texto de exposição do Prometheus
+def render_metrics():
+    descriptions = {
+        'dashboard_request_duration_seconds': 'Duração das requisições por rota',
+        'dashboard_stage_duration_seconds': 'Tempo de cada etapa (carga, agregação, figuras, layout, serialização) por rota',
+    }
+    with _histograms_lock:
+        snapshot = sorted((key, (list(buckets), total, count)) for key, (buckets, total, count) in _histograms.items())
+    lines = []
+    for metric, description in descriptions.items():
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} histogram"]
+        for (name, labels), (buckets, total, count) in snapshot:
+            if name != metric:
+                continue
+            label_text = _label_text(labels)
+            for bound, bucket_count in zip(METRICS_BUCKETS, buckets):
+                lines.append(f'{metric}_bucket{{{label_text},le="{bound}"}} {bucket_count}')
+            lines.append(f'{metric}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{metric}_sum{{{label_text}}} {total}")
+            lines.append(f"{metric}_count{{{label_text}}} {count}")
+    return '\n'.join(lines) + '\n'
+
+# Rótulo de rota da requisição: a página, para display_page; a saída, para
+# os demais callbacks; a regra de URL do Flask, para as outras rotas
+def request_route():
+    page = _display_page_request()
+    if page is not None:
+        return page
+    if request.path == f"{app.config.routes_pathname_prefix}_dash-update-component":
+        return f"callback:{(request.get_json(silent=True) or {}).get('output', '')}"
+    return request.url_rule.rule if request.url_rule is not None else 'não encontrada'
+
+# Pilha de uma thread, da chamada mais externa à mais interna, no formato collapsed
+def _folded_stack(frame):
+    names = []
+    while frame is not None:
+        names.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def _sample_stacks(interval):
+    while True:
+        time.sleep(interval)
+        with _profiled_lock:
+            targets = list(_profiled_threads.items())
+        if not targets:
+            continue
+        frames = sys._current_frames()
+        for thread_id, stacks in targets:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                stacks[_folded_stack(frame)] += 1
+
+# Inicia a thread de amostragem (uma vez por processo, como o monitoramento de csv/)
+def start_sampler():
+    global _sampler_pid
+    if _sampler_pid == os.getpid():
+        return
+    _sampler_pid = os.getpid()
+    threading.Thread(target=_sample_stacks, args=(PROFILE_INTERVAL_MS / 1000,), name='profiler', daemon=True).start()
+    logger.info(f"Perfilador por amostragem iniciado (intervalo de {PROFILE_INTERVAL_MS}ms)")
+
+# Grava as pilhas amostradas de uma requisição e retorna o caminho do arquivo
+def write_profile(route, elapsed, stacks):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = ''.join(c if c.isalnum() else '_' for c in route).strip('_')[:60] or 'raiz'
+    path = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{slug}-{elapsed * 1000:.0f}ms.folded")
+    with open(path, 'w', encoding='utf-8') as file:
+        file.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    return path
+
+@server.before_request
+def _start_request_timer():
+    _request_state.start = time.perf_counter()
+    _request_state.route = request_route()
+    rate = LOG_SAMPLE_ROUTES.get(_request_state.route, LOG_SAMPLE_RATE)
+    _request_state.log_sampled = rate >= 1 or random.random() < rate
+    _request_state.stages = {}
+    _request_state.stack = []
+    _request_state.profile = None
+    forced = PROFILE_HEADER and request.headers.get('X-Profile') == '1'
+    if PROFILE_REQUESTS or forced:
+        start_sampler()
+        _request_state.profile = (Counter(), forced)
+        with _profiled_lock:
+            _profiled_threads[threading.get_ident()] = _request_state.profile[0]
+
+@server.after_request
+def _record_request_metrics(response):
+    start = getattr(_request_state, 'start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    stages = _request_state.stages
+    route = _request_state.route
+    # O que a chamada do Dash gastou fora das etapas medidas é serialização e
+    # compressão (as páginas servidas do cache serializado não passam pelo Dash)
+    if request.path == f"{app.config.routes_pathname_prefix}_dash-update-component" and not g.get('page_cache_hit'):
+        stages['serializacao'] = max(0.0, elapsed - sum(stages.values()))
+    if METRICS_ENABLED:
+        observe('dashboard_request_duration_seconds', {'route': route}, elapsed)
+        for name, seconds in stages.items():
+            observe('dashboard_stage_duration_seconds', {'route': route, 'stage': name}, seconds)
+    response.headers.add('Server-Timing', ', '.join(
+        [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items()] + [f"total;dur={elapsed * 1000:.1f}"]))
+    profile = _request_state.profile
+    if profile is not None:
+        with _profiled_lock:
+            _profiled_threads.pop(threading.get_ident(), None)
+        stacks, forced = profile
+        if stacks and (forced or elapsed * 1000 >= PROFILE_SLOW_MS):
+            path = write_profile(route, elapsed, stacks)
+            logger.warning(f"Requisição {route} levou {elapsed * 1000:.0f}ms; pilhas gravadas em {path}")
+    return response
+
+# Encerra a medição mesmo quando a requisição termina em exceção
+@server.teardown_request
+def _stop_request_timer(exc):
+    if getattr(_request_state, 'profile', None) is not None:
+        with _profiled_lock:
+            _profiled_threads.pop(threading.get_ident(), None)
+    _request_state.start = None
+    _request_state.stages = None
+    _request_state.profile = None
+    _request_state.route = None
+    _request_state.log_sampled = True
+
+# Endpoint de métricas (formato texto do Prometheus)
+@server.route('/metrics')
+def metrics():
+    if not METRICS_ENABLED:
+        return 'Métricas desativadas (METRICS_ENABLED=0)\n', 404
+    return server.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# --- Respostas Serializadas e Compressão ---
+# A resposta de display_page (o layout inteiro, com todas as figuras) é
+# serializada pelo Dash uma única vez por página e versão dos dados: os bytes
+# JSON (gerados por to_json_plotly, que usa orjson quando instalado, com os
+# arrays numéricos em base64 tipado) ficam em cache com as variantes gzip/br,
+# e as requisições seguintes são respondidas direto desse cache, sem passar
+# pelo Dash. As demais respostas JSON/HTML/JS acima de HTTP_COMPRESS_MIN_BYTES
+# são comprimidas conforme o Accept-Encoding; os pacotes JS dos componentes,
+# imutáveis por URL, são comprimidos uma vez.
+
+HTTP_COMPRESSION = os.environ.get('HTTP_COMPRESSION', '1') == '1'
+HTTP_COMPRESS_MIN_BYTES = int(os.environ.get('HTTP_COMPRESS_MIN_BYTES', '1024'))
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/css', 'application/javascript', 'text/javascript'}
+
+_response_cache = OrderedDict()  # (página, versões) -> {codificação: corpo}
+_response_cache_lock = threading.Lock()
+_static_cache = {}  # (URL, codificação) -> corpo comprimido dos pacotes JS
+
+# Codificação aceita pelo cliente, preferindo brotli (None se nenhuma)
+def accepted_encoding():
+    if not HTTP_COMPRESSION:
+        return None
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+# Variante de um corpo em cache na codificação pedida, comprimida na primeira vez
+def _cached_variant(entry, encoding):
+    if encoding not in entry:
+        entry[encoding] = compress_body(entry[None], encoding)
+    return entry[encoding]
+
+# Resposta JSON a partir de bytes já serializados (e talvez comprimidos)
+def _json_response(data, encoding):
+    response = server.response_class(data, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+# Página pedida por uma chamada de display_page (None para outras requisições)
+def _display_page_request():
+    if request.method != 'POST' or request.path != f"{app.config.routes_pathname_prefix}_dash-update-component":
+        return None
+    body = request.get_json(silent=True) or {}
+    if body.get('output') != 'page-content.children' or not body.get('inputs'):
+        return None
+    pathname = body['inputs'][0].get('value')
+    return pathname if pathname in PAGE_LAYOUTS else '/'
+
+# Responde display_page com os bytes em cache da página e versão atuais
+@server.before_request
+def _serve_serialized_page():
+    page = _display_page_request()
+    if page is None:
+        return None
+    key = page_cache_key(page)
+    # Dados novos ainda sem layout: a última versão serializada é servida
+    # enquanto a página é reconstruída em segundo plano
+    stale_key = _page_current.get(page) if PAGE_REFRESH_BACKGROUND and key not in _page_cache else None
+    with _response_cache_lock:
+        entry = _response_cache.get(key if stale_key is None else stale_key)
+        if entry is not None:
+            _response_cache.move_to_end(key if stale_key is None else stale_key)
+    if entry is not None and stale_key is not None:
+        schedule_page_refresh(page)
+    if entry is None:
+        g.store_page_response = True  # Serializada pelo Dash e guardada em _store_and_compress
+        _request_state.page_key = None  # Versão servida, definida por cached_layout
+        return None
+    g.page_cache_hit = True
+    encoding = accepted_encoding()
+    return _json_response(_cached_variant(entry, encoding) if encoding else entry[None], encoding)
+
+# Guarda a resposta recém-serializada de display_page e comprime as respostas grandes
+@server.after_request
+def _store_and_compress(response):
+    key = getattr(_request_state, 'page_key', None) if g.pop('store_page_response', False) else None
+    if key is not None and response.status_code == 200:
+        with _response_cache_lock:
+            _response_cache[key] = {None: response.get_data()}
+            while len(_response_cache) > PAGE_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+    if (response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    data = response.get_data()
+    if len(data) < HTTP_COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding()
+    if encoding is None:
+        return response
+    if request.method == 'GET' and request.path.startswith(f"{app.config.routes_pathname_prefix}_dash-component-suites/"):
+        static_key = (request.full_path, encoding)
+        if static_key not in _static_cache:
+            _static_cache[static_key] = compress_body(data, encoding)
+        response.set_data(_static_cache[static_key])
     else:
-        return layout_geral()
+        response.set_data(compress_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# --- Exportação Estática ---
+# As seis páginas podem ser exportadas em HTML estático (python app.py
+# --export [diretório]): cada página vira um .html com as figuras Plotly
+# embutidas (os controles interativos — filtros e importação — são omitidos)
+# e um .json com o layout serializado, mais variantes .gz pré-comprimidas.
+# O plotly.js é gravado uma vez no diretório, e manifest.json registra a
+# versão dos dados de cada página: uma página só é regravada quando seus
+# dados mudam. Com STATIC_EXPORT_DIR definido, cada reconstrução em segundo
+# plano também atualiza a exportação, e o diretório é servido em /estatico/
+# sem passar pelo Dash; qualquer servidor de arquivos estáticos também serve.
+
+STATIC_EXPORT_DIR = os.environ.get('STATIC_EXPORT_DIR', '')
+STATIC_HTML_PROPS = {'id': 'id', 'className': 'class', 'href': 'href', 'target': 'target', 'title': 'title',
+                     'value': 'value', 'max': 'max', 'colSpan': 'colspan', 'rowSpan': 'rowspan'}
+
+_export_lock = threading.Lock()
+
+# Nome do arquivo estático de uma rota ('/' -> index.html)
+def static_page_name(page, extension='html'):
+    return f"{page.strip('/') or 'index'}.{extension}"
+
+def _css(style):
+    return ';'.join(f"{''.join('-' + c.lower() if c.isupper() else c for c in key)}:{value}" for key, value in style.items())
+
+def _static_attributes(props):
+    attributes = []
+    for prop, attribute in STATIC_HTML_PROPS.items():
+        value = props.get(prop)
+        if value is None or (prop == 'id' and not isinstance(value, str)):
+            continue
+        if prop == 'href' and value in PAGE_LAYOUTS:
+            value = static_page_name(value)  # Links entre páginas apontam para os arquivos exportados
+        attributes.append(f' {attribute}="{html_escape(str(value))}"')
+    if props.get('style'):
+        attributes.append(f' style="{html_escape(_css(props["style"]))}"')
+    return ''.join(attributes)
+
+# HTML de uma árvore de componentes Dash: componentes html viram as tags
+# correspondentes, dcc.Graph vira um gráfico Plotly com a figura embutida,
+# dcc.Link um link; os demais componentes dcc são interativos e omitidos
+def render_static(component, graphs):
+    if component is None:
+        return ''
+    if isinstance(component, (list, tuple)):
+        return ''.join(render_static(child, graphs) for child in component)
+    if not isinstance(component, Component):
+        return html_escape(str(component))
+    props = {prop: getattr(component, prop) for prop in component._prop_names if getattr(component, prop, None) is not None}
+    if component._type == 'Graph':
+        graph_id = f"grafico-{len(graphs)}"
+        figure = json.loads(to_json_plotly(props.get('figure') or {}))
+        graphs.append((graph_id, figure.get('data', []), figure.get('layout', {}), props.get('config') or {}))
+        return f'<div id="{graph_id}"{_static_attributes({"style": props.get("style")})}></div>'
+    if component._type == 'Link':
+        return f"<a{_static_attributes(props)}>{render_static(props.get('children'), graphs)}</a>"
+    if component._namespace != 'dash_html_components':
+        return ''
+    tag = component._type.lower()
+    return f"<{tag}{_static_attributes(props)}>{render_static(props.get('children'), graphs)}</{tag}>"
+
+# Página estática completa: o CSS do index_string, cabeçalho, navegação e o layout
+def static_page_html(layout, plotly_js):
+    graphs = []
+    body = render_static([PAGE_HEADER, NAV_BAR, html.Div(className="content", children=layout)], graphs)
+    style = app.index_string[app.index_string.index('<style>'):app.index_string.index('</style>') + len('</style>')]
+    scripts = ''.join(
+        f"Plotly.newPlot({json.dumps(graph_id)}, {json.dumps(data)}, {json.dumps(fig_layout)}, {json.dumps(config)});\n"
+        for graph_id, data, fig_layout, config in graphs).replace('</', '<\\/')
+    return (f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{html_escape(app.title)}</title>\n'
+            f'{style}\n<script src="{plotly_js}"></script>\n</head>\n<body>\n{body}\n<script>\n{scripts}</script>\n'
+            '</body>\n</html>\n')
+
+# Grava um arquivo e sua variante .gz (troca atômica de cada arquivo)
+def _write_static(path, data):
+    for target, content in ((path, data), (path + '.gz', gzip.compress(data, compresslevel=9))):
+        with open(target + '.tmp', 'wb') as file:
+            file.write(content)
+        os.replace(target + '.tmp', target)
+
+# Exporta as páginas (todas, por padrão) para o diretório; páginas cuja versão
+# dos dados é a mesma da última exportação não são regravadas
+def export_static(directory=None, pages=None):
+    directory = directory or STATIC_EXPORT_DIR or 'static_export'
+    with _export_lock:
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, 'manifest.json')
+        try:
+            with open(manifest_path, encoding='utf-8') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            manifest = {}
+        plotly_js = f"plotly-{get_plotlyjs_version()}.min.js"
+        if not os.path.exists(os.path.join(directory, plotly_js)):
+            _write_static(os.path.join(directory, plotly_js), get_plotlyjs().encode('utf-8'))
+        for page in pages or PAGE_LAYOUTS:
+            key = page_cache_key(page)
+            versions = json.loads(json.dumps(key[1]))
+            if (manifest.get(page, {}).get('versions') == versions
+                    and os.path.exists(os.path.join(directory, static_page_name(page)))):
+                continue
+            start = time.perf_counter()
+            layout = cached_layout(page, PAGE_LAYOUTS[page])
+            key = _request_state.page_key  # Versão efetivamente exportada
+            _write_static(os.path.join(directory, static_page_name(page)), static_page_html(layout, plotly_js).encode('utf-8'))
+            _write_static(os.path.join(directory, static_page_name(page, 'json')), to_json_plotly(layout).encode('utf-8'))
+            stamp = data_as_of(key)
+            manifest[page] = {'html': static_page_name(page), 'json': static_page_name(page, 'json'),
+                              'versions': json.loads(json.dumps(key[1])),
+                              'dados_de': stamp.isoformat(timespec='seconds') if stamp else None}
+            logger.info(f"Página {page} exportada em {directory} em {time.perf_counter() - start:.2f}s")
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+# Serve a exportação estática, com a variante .gz quando o cliente aceita gzip
+@server.route('/estatico/', defaults={'path': 'index.html'})
+@server.route('/estatico/<path:path>')
+def static_export(path):
+    directory = os.path.abspath(STATIC_EXPORT_DIR or 'static_export')
+    if request.accept_encodings['gzip'] and os.path.exists(os.path.join(directory, path + '.gz')):
+        response = send_from_directory(directory, path + '.gz', mimetype=mimetypes.guess_type(path)[0])
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+    return send_from_directory(directory, path)
 
 # --- 8. Execução da Aplicação ---
 if __name__ == '__main__':
-    app.run_server(debug=True, host='0.0.0.0', port=8050)
\ No newline at end of file
+    if '--export' in sys.argv:
+        # python app.py --export [diretório]: exporta as páginas em HTML estático e encerra
+        arguments = sys.argv[sys.argv.index('--export') + 1:]
+        load_all_datasets()
+        export_static(arguments[0] if arguments else None)
+    else:
+        app.run_server(debug=True, host='0.0.0.0', port=8050)
\ No newline at end of file
@@ -0,0 +1,201 @@
+# benchmarks/suite.py
+# Mede como app.py escala com o volume de dados: para cada tamanho, gera os
+# CSVs sintéticos (benchmarks/synthetic_data.py) e, num processo novo com o
+# diretório gerado como diretório de trabalho, cronometra cada carregador
+# load_*_data, a recarga de cada conjunto registrado (limpeza, agregados e
+# cadastros), cada função layout_* e display_page por rota (com o cache de
+# layouts vazio), além da serialização JSON da resposta. O pico de memória
+# de cada medida vem do tracemalloc, numa execução separada da cronometrada.
+# O resultado é gravado em JSON (commit, ambiente e uma linha por medida)
+# para comparar commits com --compare.
+#
+# Uso: python benchmarks/suite.py [linhas ...] [--repeat N] [--no-memory] [--output arquivo.json]
+#                                 (padrão: 1000 10000 100000; vai até 10⁷)
+#      python benchmarks/suite.py --compare base.json novo.json [--threshold 0.1]
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic_data  # noqa: E402
+
+# Ambiente padrão dos processos medidos: sem threads de fundo, sem snapshots
+# e sem pool, para que cada medida leia o CSV, e sem log no console (o log em
+# arquivo, app.log no diretório gerado, continua como em produção); variáveis
+# já definidas (ex.: DATA_BACKEND=sqlite) são respeitadas
+WORKER_ENV = {
+    'DATA_WARMUP': '0',
+    'CSV_WATCH_INTERVAL': '0',
+    'CSV_SNAPSHOTS': '0',
+    'DATA_LOAD_WORKERS': '1',
+    'LOG_CONSOLE': '0',
+}
+
+
+# Tempo mínimo e médio de repeat execuções e, opcionalmente, o pico de memória
+def measure(func, repeat, memory):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    measurement = {'min_s': min(times), 'mean_s': sum(times) / len(times), 'repeat': repeat, 'peak_mb': None}
+    if memory:
+        tracemalloc.start()
+        func()
+        measurement['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return measurement, result
+
+
+# Executado no processo novo, com os CSVs sintéticos em ./csv
+def run_worker(rows, repeat, memory):
+    sys.path.insert(0, REPO_DIR)
+    import app
+    from plotly.io.json import to_json_plotly
+
+    results = []
+
+    def record(group, name, func, **extra):
+        measurement, result = measure(func, repeat, memory)
+        results.append({'rows': rows, 'group': group, 'name': name, **measurement, **extra})
+        return result
+
+    for name in sorted(n for n in dir(app) if n.startswith('load_') and n.endswith('_data')):
+        df = record('loader', name, getattr(app, name))
+        results[-1]['result_rows'] = len(df)
+    # Carga completa: o conjunto publicado é descartado antes, senão a ingestão incremental não relê nada
+    def full_reload(name):
+        app._datasets.pop(name, None)
+        return app.reload_dataset(name)
+
+    for name in app._dataset_loaders:
+        record('dataset', name, lambda name=name: full_reload(name))
+    for name in sorted(n for n in dir(app) if n.startswith('layout_')):
+        record('layout', name, getattr(app, name))
+    for route in app.PAGE_LAYOUTS:
+        def display_page(route=route):
+            app.invalidate_page_cache()
+            return app.display_page(route)
+        layout = record('display_page', route, display_page)
+        payload = record('serialize', route, lambda layout=layout: to_json_plotly(layout))
+        results[-1]['bytes'] = len(payload)
+    return results
+
+
+# Gera (se preciso) os dados de um tamanho e mede num processo novo
+def run_size(rows, repeat, memory, data_dir):
+    directory = os.path.join(data_dir, str(rows))
+    if not os.path.exists(os.path.join(directory, 'csv', 'relatorio.csv')):
+        start = time.perf_counter()
+        synthetic_data.generate(directory, rows)
+        print(f"{rows:,} linhas geradas em {directory} ({time.perf_counter() - start:.1f}s)")
+    result_path = os.path.join(directory, 'resultado.json')
+    command = [sys.executable, os.path.abspath(__file__), '--worker', str(rows), '--repeat', str(repeat),
+               '--result', result_path] + ([] if memory else ['--no-memory'])
+    env = {**WORKER_ENV, **os.environ}
+    subprocess.run(command, cwd=directory, env=env, check=True)
+    with open(result_path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+# Commit atual do repositório (None fora de um checkout git)
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import pandas as pd
+    import dash
+    import plotly
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'pandas': pd.__version__,
+        'dash': dash.__version__,
+        'plotly': plotly.__version__,
+        'env': {key: os.environ.get(key, value) for key, value in WORKER_ENV.items()},
+    }
+
+
+def print_results(results):
+    for item in results:
+        peak = '' if item['peak_mb'] is None else f"{item['peak_mb']:10.1f} MB"
+        print(f"  {item['rows']:>10,}  {item['group']:<13} {item['name']:<32} {item['min_s']:9.4f}s {peak}")
+
+
+# Compara dois resultados: razão novo/base do tempo mínimo e do pico de memória
+# por medida. Retorna 1 se alguma medida piorou mais que threshold.
+def compare(base_path, new_path, threshold):
+    with open(base_path, encoding='utf-8') as file:
+        base = {(r['rows'], r['group'], r['name']): r for r in json.load(file)['results']}
+    with open(new_path, encoding='utf-8') as file:
+        new = json.load(file)['results']
+    regressions = 0
+    for item in new:
+        old = base.get((item['rows'], item['group'], item['name']))
+        if old is None:
+            continue
+        ratio = item['min_s'] / max(old['min_s'], 1e-9)
+        memory_ratio = item['peak_mb'] / max(old['peak_mb'], 1e-9) if item['peak_mb'] and old['peak_mb'] else None
+        worse = ratio > 1 + threshold or (memory_ratio is not None and memory_ratio > 1 + threshold)
+        regressions += worse
+        memory = '' if memory_ratio is None else f"  memória {memory_ratio:5.2f}x"
+        print(f"{'!!' if worse else '  '} {item['rows']:>10,}  {item['group']:<13} {item['name']:<32} "
+              f"{old['min_s']:9.4f}s -> {item['min_s']:9.4f}s  ({ratio:5.2f}x){memory}")
+    print(f"{regressions} medidas pioraram mais de {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de carga e layouts do dashboard')
+    parser.add_argument('sizes', nargs='*', type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', dest='memory', action='store_false')
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'))
+    parser.add_argument('--output')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NOVO'))
+    parser.add_argument('--threshold', type=float, default=0.1)
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+    if args.worker is not None:
+        results = run_worker(args.worker, args.repeat, args.memory)
+        with open(args.result, 'w', encoding='utf-8') as file:
+            json.dump(results, file)
+        return
+
+    commit = git_commit()
+    output = args.output or os.path.join(BENCH_DIR, 'results', f"{commit or 'local'}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    results = []
+    for rows in args.sizes:
+        size_results = run_size(rows, args.repeat, args.memory, args.data_dir)
+        print_results(size_results)
+        results.extend(size_results)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump({'commit': commit, 'timestamp': datetime.now().isoformat(timespec='seconds'),
+                   'environment': environment(), 'results': results}, file, indent=1)
+    print(f"Resultados gravados em {output}")
+
+
+if __name__ == '__main__':
+    main()
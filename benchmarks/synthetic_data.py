@@ -0,0 +1,151 @@
+# benchmarks/synthetic_data.py
+# Gera CSVs sintéticos com o formato dos arquivos de csv/ (relatorio.csv,
+# historico_importacao.csv, despesas.csv e pedidos.csv), com os mesmos
+# separadores, datas dd/mm/aaaa e valores no formato brasileiro, para medir
+# como a carga e os layouts escalam de 10³ a 10⁷ linhas. Os cadastros
+# (setores, operadores, países, exceções e produtos) são copiados de csv/ e
+# as chaves dos fatos são sorteadas entre as chaves desses cadastros.
+#
+# Uso: python benchmarks/synthetic_data.py <diretório> <linhas> [semente]
+#      (os arquivos são gravados em <diretório>/csv/)
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO_CSV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'csv')
+LOOKUP_FILES = ['setores.csv', 'cadastro_de_operadores_logisticos.csv', 'bandeiras_paises.csv',
+                'cadastro_de_execoes.csv', 'produtos.csv']
+CHUNK_ROWS = 1_000_000  # Linhas geradas e gravadas por vez (memória limitada para 10⁷ linhas)
+
+CATEGORIAS_ENTRADA = ['Receita de vendas', 'Receita de serviços', 'Outras entradas']
+CATEGORIAS_SAIDA = ['Despesas comerciais', 'Despesas administrativas', 'Despesas com serviços', 'Gastos com pessoal',
+                    'Impostos']
+CATEGORIAS_DESPESAS = ['MERCADO', 'RESTAURANTE', 'TELEFONE', 'CONDOMINIO', 'FARMACIA', 'COMBUSTIVEL', 'LAZER']
+
+
+# Chaves de um cadastro de csv/ (ou as padrão, se o arquivo não existir)
+def lookup_keys(file_name, column, default, **read_options):
+    path = os.path.join(REPO_CSV_DIR, file_name)
+    if not os.path.exists(path):
+        return np.array(default)
+    return pd.read_csv(path, **read_options)[column].dropna().unique()
+
+
+# Datas dd/mm/aaaa de códigos de dia: formata só os dias distintos e indexa
+def format_dates(days, start='2021-01-01'):
+    calendar = pd.date_range(start, periods=int(days.max()) + 1, freq='D').strftime('%d/%m/%Y').to_numpy()
+    return calendar[days]
+
+
+# Valores no formato brasileiro: 'R$ 1.234,56' (com sinal opcional) ou '1234,56'
+def format_brl(values, currency=True):
+    cents = np.round(np.abs(values) * 100).astype(np.int64)
+    integer = pd.Series(cents // 100)
+    integer = integer.map('{:,}'.format).str.replace(',', '.', regex=False) if currency else integer.astype(str)
+    text = integer + ',' + pd.Series(cents % 100).astype(str).str.zfill(2)
+    if currency:
+        text = 'R$ ' + text
+    return np.where(values < 0, '-' + text, text)
+
+
+def financial_chunk(rng, rows, offset, centros):
+    tipo = rng.choice(['Entradas', 'Saídas'], size=rows)
+    categoria = np.where(tipo == 'Entradas', rng.choice(CATEGORIAS_ENTRADA, size=rows), rng.choice(CATEGORIAS_SAIDA, size=rows))
+    valor = rng.uniform(10, 20000, size=rows).round(2)
+    return pd.DataFrame({
+        'Data': format_dates(rng.integers(0, 730, size=rows)),
+        'Conta Contábil': rng.integers(102000, 103000, size=rows),
+        'Tipo Movimentação': tipo,
+        'Classificação': categoria,
+        'Documento Fiscal': np.arange(offset, offset + rows) + 1_000_000,
+        'Centro de Custo': rng.choice(centros, size=rows),
+        'Status': rng.choice(['Pago', 'Pendente'], size=rows, p=[0.8, 0.2]),
+        'Valor': format_brl(valor),
+        'Saldo': format_brl(np.where(tipo == 'Saídas', -valor, valor)),
+    })
+
+
+def logistics_chunk(rng, rows, offset, operadores, paises, excecoes):
+    coleta = rng.integers(0, 1095, size=rows)
+    prazo_contratado = rng.integers(5, 45, size=rows)
+    prazo_realizado = np.maximum(1, prazo_contratado + rng.integers(-5, 10, size=rows))
+    excecao = np.where(rng.random(rows) < 0.1, rng.choice(excecoes, size=rows), '')
+    return pd.DataFrame({
+        'Operação': 'Importação',
+        'Tipo': rng.choice(['Aéreo', 'Marítimo ', 'Rodoviário'], size=rows, p=[0.6, 0.3, 0.1]),
+        'No. Invoice': np.arange(offset, offset + rows) + 900_000,
+        'Incoterm': rng.choice(['EXW', 'FCA', 'FOB'], size=rows),
+        'Origem': rng.choice(paises, size=rows),
+        'ID País Destino': 'BR',
+        'Local Destino': rng.choice(['Campinas', 'Santos', 'Guarulhos'], size=rows),
+        'ID Operador Logístico': rng.choice(operadores, size=rows),
+        'Doc. Embarque (AWB / BL)': pd.Series(np.arange(offset, offset + rows)).map('0010-{:012d}'.format).to_numpy(),
+        'Peso (kg)': rng.uniform(1, 5000, size=rows).round(1),
+        'Volume (cbm)': rng.uniform(0.01, 40, size=rows).round(3),
+        'Tipo de serviço': rng.choice(['STANDARD', 'EXPRESS'], size=rows, p=[0.85, 0.15]),
+        'Data da Coleta': format_dates(coleta, '2023-01-01'),
+        'Data da Entrega': format_dates(coleta + prazo_realizado, '2023-01-01'),
+        'Prazo Realizado': prazo_realizado,
+        'Prazo Contratado': prazo_contratado,
+        'Cód. Exceção': excecao,
+    })
+
+
+def personal_expenses_chunk(rng, rows):
+    return pd.DataFrame({
+        'Data': format_dates(rng.integers(0, 365, size=rows), '2024-06-01'),
+        'Categoria': rng.choice(CATEGORIAS_DESPESAS, size=rows),
+        'Valor': format_brl(-rng.uniform(1, 800, size=rows).round(2), currency=False),
+    })
+
+
+def sales_chunk(rng, rows, produtos):
+    pedido = rng.integers(0, 730, size=rows)
+    quantidade = rng.integers(1, 60, size=rows)
+    return pd.DataFrame({
+        'Data': format_dates(pedido, '2023-01-01'),
+        'Data_Entrega': format_dates(pedido + rng.integers(1, 15, size=rows), '2023-01-01'),
+        'Produto': rng.choice(produtos, size=rows),
+        'Quantidade': quantidade,
+        'Total': quantidade * rng.integers(20, 120, size=rows),
+    })
+
+
+# Grava um CSV bloco a bloco
+def write_csv(path, rows, make_chunk, sep):
+    for offset in range(0, rows, CHUNK_ROWS):
+        chunk = make_chunk(min(CHUNK_ROWS, rows - offset), offset)
+        chunk.to_csv(path, sep=sep, index=False, header=offset == 0, mode='w' if offset == 0 else 'a', encoding='utf-8')
+
+
+# Gera os quatro fatos com o número de linhas pedido e copia os cadastros
+def generate(directory, rows, seed=42):
+    rng = np.random.default_rng(seed)
+    csv_dir = os.path.join(directory, 'csv')
+    os.makedirs(csv_dir, exist_ok=True)
+    for file_name in LOOKUP_FILES:
+        if os.path.exists(os.path.join(REPO_CSV_DIR, file_name)):
+            shutil.copy(os.path.join(REPO_CSV_DIR, file_name), csv_dir)
+    centros = lookup_keys('setores.csv', 'Centro de Custo', [100901, 100902, 100903], sep=';')
+    operadores = lookup_keys('cadastro_de_operadores_logisticos.csv', 'ID Carrier', [1146, 1147, 4089], sep='\t')
+    paises = pd.read_csv(os.path.join(REPO_CSV_DIR, 'bandeiras_paises.csv'), sep=';') if os.path.exists(
+        os.path.join(REPO_CSV_DIR, 'bandeiras_paises.csv')) else pd.DataFrame({'ID País Origem': ['DE'], 'País': ['Germany']})
+    origens = (paises['ID País Origem'] + '-' + paises['País']).to_numpy()
+    excecoes = lookup_keys('cadastro_de_execoes.csv', 'Cód Exceção', ['E01', 'E02', 'E03'], sep=';')
+    produtos = lookup_keys('produtos.csv', 'Produto', ['Uva', 'Banana', 'Manga'], sep=';', usecols=[0, 1])
+    write_csv(os.path.join(csv_dir, 'relatorio.csv'), rows,
+              lambda n, offset: financial_chunk(rng, n, offset, centros), ';')
+    write_csv(os.path.join(csv_dir, 'historico_importacao.csv'), rows,
+              lambda n, offset: logistics_chunk(rng, n, offset, operadores, origens, excecoes), ',')
+    write_csv(os.path.join(csv_dir, 'despesas.csv'), rows, lambda n, offset: personal_expenses_chunk(rng, n), ';')
+    write_csv(os.path.join(csv_dir, 'pedidos.csv'), rows, lambda n, offset: sales_chunk(rng, n, produtos), ';')
+    return csv_dir
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit('Uso: python benchmarks/synthetic_data.py <diretório> <linhas> [semente]')
+    print(generate(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) > 3 else 42))
@@ -0,0 +1,36 @@
+# gunicorn.conf.py
+# Configuração do Gunicorn usada pelo Dockerfile e pelo docker-compose.yml
+import gc
+import os
+
+bind = '0.0.0.0:8050'
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+
+# Com preload_app, app.py (e todos os DataFrames) é carregado uma única vez no
+# processo mestre; os workers herdam essas páginas de memória por copy-on-write
+# após o fork, em vez de cada um manter sua própria cópia dos dados.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+if preload_app:
+    # O coletor de lixo escreve no cabeçalho de cada objeto que percorre, o que
+    # forçaria a cópia das páginas herdadas. Ele fica desligado durante a carga
+    # de app.py e dos dados; em seguida, os objetos carregados são congelados
+    # (gc.freeze os tira das varreduras) e o coletor volta a rodar no mestre,
+    # que assim não acumula ciclos ao longo da vida nem entre reinícios de workers.
+    gc.disable()
+
+
+def when_ready(server):
+    if preload_app:
+        # Com a carga sob demanda, os dados seriam lidos por cada worker; aqui
+        # eles são lidos uma vez no mestre, antes do primeiro fork
+        import app
+        app.load_all_datasets()
+        gc.freeze()
+        gc.enable()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Objetos criados no mestre desde o último fork também são congelados
+        gc.freeze()
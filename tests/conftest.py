@@ -0,0 +1,44 @@
+# tests/conftest.py
+# Importa app.py sem threads de fundo, snapshots, pool nem log em arquivo, e
+# oferece uma cópia dos CSVs de csv/ num diretório temporário (os caminhos
+# registrados são relativos ao diretório de trabalho).
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+os.environ.update({
+    'DATA_WARMUP': '0',
+    'CSV_WATCH_INTERVAL': '0',
+    'CSV_SNAPSHOTS': '0',
+    'DATA_LOAD_WORKERS': '1',
+    'LOG_FILE': '',
+    'LOG_CONSOLE': '0',
+})
+
+
+@pytest.fixture
+def app_module():
+    import app
+    return app
+
+
+# Diretório de trabalho com uma cópia dos CSVs e o registro de dados vazio
+@pytest.fixture
+def csv_copy(tmp_path, monkeypatch, app_module):
+    os.makedirs(tmp_path / 'csv')
+    for file_name in os.listdir(os.path.join(REPO_DIR, 'csv')):
+        if file_name.endswith('.csv'):
+            shutil.copy(os.path.join(REPO_DIR, 'csv', file_name), tmp_path / 'csv')
+    monkeypatch.chdir(tmp_path)
+    app_module._datasets.clear()
+    app_module._pending_versions.clear()
+    app_module._dimension_cache.clear()
+    yield tmp_path / 'csv'
+    app_module._datasets.clear()
+    app_module._pending_versions.clear()
+    app_module._dimension_cache.clear()
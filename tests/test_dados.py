@@ -0,0 +1,29 @@
+# tests/test_dados.py
+import pandas as pd
+
+
+# Um bloco com a coluna categórica toda nula não impede a união das categorias
+def test_concat_frames_with_all_null_categorical_block(app_module):
+    populated = pd.DataFrame({'Cód. Exceção': pd.Series(['E01', None, 'E02']).astype('category'), 'Valor': [1, 2, 3]})
+    empty = pd.DataFrame({'Cód. Exceção': pd.Series([None, None]).astype('category'), 'Valor': [4, 5]})
+    for frames in ([populated, empty], [empty, populated]):
+        df = app_module.concat_frames(frames)
+        assert isinstance(df['Cód. Exceção'].dtype, pd.CategoricalDtype)
+        assert sorted(df['Cód. Exceção'].cat.categories) == ['E01', 'E02']
+        assert df['Cód. Exceção'].isna().sum() == 3
+        assert df['Valor'].sum() == 15
+
+
+# Leitura em blocos pequenos: blocos sem nenhum código de exceção são comuns
+def test_stream_csv_small_chunks_matches_full_load(csv_copy, app_module):
+    spec = app_module._dataset_loaders['logistica']
+    full = spec.loader(spec.file_path)
+    df, aggregates = app_module.stream_csv(spec.file_path, spec.cleaner, spec.read_options, spec.aggregator, spec.dtypes,
+                                           keep_rows=True, chunk_rows=37)
+    assert len(df) == len(full) > 0
+    pd.testing.assert_frame_equal(df.astype({'Cód. Exceção': object}), full.astype({'Cód. Exceção': object}),
+                                  check_categorical=False)
+    expected = spec.aggregator(full)
+    assert aggregates['kpis']['total_envios'] == expected['kpis']['total_envios']
+    assert abs(aggregates['kpis']['peso_total'] - expected['kpis']['peso_total']) < 1e-6
+    pd.testing.assert_frame_equal(aggregates['otd_tipo'].sort_index(), expected['otd_tipo'].sort_index(), check_dtype=False)
@@ -0,0 +1,57 @@
+# tests/test_dimensoes.py
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from conftest import REPO_DIR
+
+
+# O cadastro é carregado no primeiro uso; chaves ausentes dele ficam nulas
+def test_enrich_with_dimensions_loads_lookup_on_demand(csv_copy, app_module):
+    assert 'setores' not in app_module._datasets
+    df = pd.DataFrame({'Conta': [100901, 999999, 100903]})
+    enriched = app_module.enrich_with_dimensions(df, app_module.FINANCIAL_DIMENSIONS)
+    assert 'setores' in app_module._datasets
+    assert enriched['Conta'].tolist() == [100901, 999999, 100903]
+    assert enriched['Setor'].iloc[0] == 'Logística'
+    assert pd.isna(enriched['Setor'].iloc[1])
+    assert enriched['Setor'].iloc[2] == 'Comercial'
+
+
+# O fato publicado já traz as colunas associadas aos cadastros
+def test_financial_dataset_has_joined_sector(csv_copy, app_module):
+    df = app_module.get_dataset('financeiro')
+    assert 'Setor' in df.columns
+    setores = set(app_module.get_dataset('setores')['Setor'])
+    assert set(df['Setor'].dropna()) <= setores
+    assert df['Setor'].notna().any()
+
+
+def test_dimension_values_mixed_categorical(csv_copy, app_module):
+    keys = pd.Series(['E01', None, 'X99', 'E02']).astype('category')
+    values = app_module.dimension_values('excecao', keys)
+    assert values.tolist()[0] == 'Avaria (Carga Danificada)'
+    assert pd.isna(values.iloc[1]) and pd.isna(values.iloc[2])
+    assert values.tolist()[3] == 'Extravio (Carga Perdida)'
+
+
+# Chaves categóricas todas nulas (sem categorias) não indexam o cadastro
+def test_dimension_values_all_null_categorical(csv_copy, app_module):
+    keys = pd.Series([None, None]).astype('category')
+    values = app_module.dimension_values('excecao', keys)
+    assert len(values) == 2
+    assert values.isna().all()
+
+
+# Com DATA_LAZY_LOAD=0 os conjuntos são lidos na importação, depois de todos
+# os registros: o financeiro já sai com o setor do cadastro
+def test_eager_load_joins_dimensions(csv_copy):
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); import app; "
+            "assert set(app._datasets) == set(app._dataset_loaders), sorted(app._datasets); "
+            "df = app.get_dataset('financeiro'); "
+            "assert 'Setor' in df.columns and df['Setor'].notna().any(), list(df.columns)")
+    result = subprocess.run([sys.executable, '-c', code, REPO_DIR], cwd=csv_copy.parent, capture_output=True, text=True,
+                            env={**os.environ, 'DATA_LAZY_LOAD': '0'}, timeout=300)
+    assert result.returncode == 0, result.stderr[-2000:]
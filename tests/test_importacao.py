@@ -0,0 +1,72 @@
+# tests/test_importacao.py
+import base64
+import json
+import os
+import threading
+import time
+
+import pytest
+from dash.exceptions import PreventUpdate
+
+
+# Identificadores fora do formato do uuid4 não viram caminho de arquivo
+def test_upload_progress_rejects_path_traversal(tmp_path, monkeypatch, app_module):
+    monkeypatch.setattr(app_module, 'UPLOAD_DIR', str(tmp_path / 'uploads'))
+    os.makedirs(tmp_path / 'uploads')
+    target = tmp_path / 'x.json'
+    target.write_text(json.dumps({'status': 'concluido', 'progress': 1, 'file': 'x', 'message': 'segredo'}))
+    for job in ['../x', '../../x', 'ABCDEF' * 6, {'job': 'x'}]:
+        with pytest.raises(PreventUpdate):
+            app_module.upload_progress(1, job)
+    assert target.exists()
+
+
+# Estado sem a chave 'status' não encerra o acompanhamento nem causa erro
+def test_upload_progress_status_without_key(tmp_path, monkeypatch, app_module):
+    monkeypatch.setattr(app_module, 'UPLOAD_DIR', str(tmp_path))
+    job = 'a' * 32
+    (tmp_path / f'{job}.json').write_text(json.dumps({'progress': 0.5, 'file': 'f.csv', 'message': 'lendo'}))
+    _, done = app_module.upload_progress(1, job)
+    assert done is False
+    assert (tmp_path / f'{job}.json').exists()
+
+
+def wait_upload(app_module, job, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = app_module.read_upload_status(job)
+        if status and status.get('status') in ('concluido', 'erro'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"importação {job} não terminou")
+
+
+# A requisição só agenda a importação: a decodificação roda na thread de fundo
+def test_start_upload_decodes_in_background(csv_copy, monkeypatch, app_module):
+    monkeypatch.setattr(app_module, 'UPLOAD_DIR', str(csv_copy / '.uploads'))
+    monkeypatch.setattr(app_module, 'UPLOAD_DECODE_CHUNK', 4 * 64)
+    data = (csv_copy / 'despesas.csv').read_bytes()
+    contents = 'data:text/csv;base64,' + base64.b64encode(data + data).decode()
+    release = threading.Event()
+    decode_upload = app_module.decode_upload
+
+    def blocked_decode(*args, **kwargs):
+        assert release.wait(30)
+        return decode_upload(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, 'decode_upload', blocked_decode)
+    job = app_module.start_upload('despesas_pessoais', contents, 'despesas.csv')
+    assert app_module.read_upload_status(job)['status'] == 'na fila'
+    release.set()
+    status = wait_upload(app_module, job)
+    assert status['status'] == 'concluido', status
+    assert (csv_copy / 'despesas.csv').read_bytes() == data + data
+    assert app_module.get_aggregates('despesas_pessoais')['kpis']['transacoes'] > 0
+
+
+def test_start_upload_invalid_base64(csv_copy, monkeypatch, app_module):
+    monkeypatch.setattr(app_module, 'UPLOAD_DIR', str(csv_copy / '.uploads'))
+    job = app_module.start_upload('financeiro', 'data:text/csv;base64,@@@@', 'relatorio.csv')
+    status = wait_upload(app_module, job)
+    assert status['status'] == 'erro'
+    assert not os.path.exists(os.path.join(app_module.UPLOAD_DIR, f'{job}.csv'))